@@ -29,10 +29,29 @@ empate.
 
 from juegos_simplificado import ModeloJuegoZT2
 from juegos_simplificado import juega_dos_jugadores
+from juegos_simplificado import compara_modelos
 from minimax import jugador_negamax
 from minimax import minimax_iterativo
+from minimax import ContextoBusqueda
+from minimax import EvaluacionPorLotes
+from transposicion import claves_zobrist
+from transposicion import zobrist_imagen
+from finales import ResolvedorFinales
+
+try:
+    import numpy as np
+except ImportError:  # Solo se necesita para la evaluación por lotes
+    np = None
 
 class Conecta4(ModeloJuegoZT2):
+    ZOBRIST = claves_zobrist(42)
+    # Identidad y reflejo de izquierda a derecha (son sus propias inversas)
+    SIMETRIAS = (
+        tuple(range(42)),
+        tuple(7 * (i // 7) + 6 - i % 7 for i in range(42))
+    )
+    SIMETRIA_INVERSA = (0, 1)
+
     def inicializa(self):
         return (tuple([0 for _ in range(6 * 7)]), 1)
         
@@ -79,7 +98,179 @@ class Conecta4(ModeloJuegoZT2):
         if 0 not in s:
             return True
         return self.ganancia(s) != 0
-    
+
+    def zobrist(self, s):
+        return _zobrist_casillas(self.ZOBRIST, s)
+
+    def zobrist_transicion(self, h, s, a, j, s_nuevo):
+        for i in range(5, -1, -1):
+            if s[a + 7 * i] == 0:
+                return h ^ self.ZOBRIST[a + 7 * i][j == -1]
+        return h
+
+    def zobrist_simetrias(self, s):
+        """Hash de Zobrist de s y de su reflejo (ver ConSimetrias)"""
+        return tuple(zobrist_imagen(self.ZOBRIST, s, p) for p in self.SIMETRIAS)
+
+    def zobrist_simetrias_transicion(self, hs, s, a, j, s_nuevo):
+        """zobrist_simetrias de transicion(s, a, j) a partir de hs"""
+        for i in range(a + 35, -1, -7):
+            if s[i] == 0:
+                return tuple(
+                    h ^ self.ZOBRIST[p[i]][j == -1]
+                    for h, p in zip(hs, self.SIMETRIAS)
+                )
+        return hs
+
+    def simetria_jugada(self, a, k):
+        """Columna que corresponde a a en el estado reflejado si k es 1"""
+        return 6 - a if k else a
+
+    def mutable(self, s):
+        return list(s)
+
+    def hacer(self, estado, a, j):
+        for i in range(a + 35, -1, -7):
+            if estado[i] == 0:
+                estado[i] = j
+                return
+
+    def deshacer(self, estado, a, j):
+        for i in range(a, 42, 7):
+            if estado[i] != 0:
+                estado[i] = 0
+                return
+
+
+class Conecta4Bitboard(ModeloJuegoZT2):
+    """
+    Conecta 4 sobre bitboards.
+
+    El estado es una tupla (x, o, alturas, ganador) donde x y o son
+    enteros de 64 bits con las fichas de cada jugador, alturas es una tupla
+    con el número de fichas en cada columna y ganador es el jugador que
+    conectó 4 con la última jugada (0 si nadie).
+
+    Cada columna ocupa 7 bits (6 casillas más un bit centinela), de abajo
+    hacia arriba:
+
+    5 12 19 26 33 40 47
+    4 11 18 25 32 39 46
+    3 10 17 24 31 38 45
+    2  9 16 23 30 37 44
+    1  8 15 22 29 36 43
+    0  7 14 21 28 35 42
+
+    El bit centinela evita que los corrimientos pasen de una columna a la
+    siguiente, por lo que una línea de 4 se detecta con dos operaciones
+    de corrimiento y máscara por dirección.
+
+    """
+    LLENO = (6,) * 7
+    ZOBRIST = claves_zobrist(49)
+
+    def inicializa(self):
+        return ((0, 0, (0,) * 7, 0), 1)
+
+    def jugadas_legales(self, s, j):
+        alturas = s[2]
+        return (columna for columna in range(7) if alturas[columna] < 6)
+
+    def transicion(self, s, a, j):
+        x, o, alturas, _ = s
+        ficha = 1 << (7 * a + alturas[a])
+        alturas = alturas[:a] + (alturas[a] + 1,) + alturas[a + 1:]
+        if j == 1:
+            x |= ficha
+            gana = conecta_4(x)
+        else:
+            o |= ficha
+            gana = conecta_4(o)
+        return (x, o, alturas, j if gana else 0)
+
+    def ganancia(self, s):
+        return s[3]
+
+    def terminal(self, s):
+        return s[3] != 0 or s[2] == self.LLENO
+
+    def zobrist(self, s):
+        x, o, _, _ = s
+        h = 0
+        for i in range(49):
+            if x >> i & 1:
+                h ^= self.ZOBRIST[i][0]
+            elif o >> i & 1:
+                h ^= self.ZOBRIST[i][1]
+        return h
+
+    def zobrist_transicion(self, h, s, a, j, s_nuevo):
+        return h ^ self.ZOBRIST[7 * a + s[2][a]][j == -1]
+
+
+def _zobrist_casillas(claves, s):
+    """Hash de Zobrist de un estado representado por casillas 0, 1, -1"""
+    h = 0
+    for i, x in enumerate(s):
+        if x != 0:
+            h ^= claves[i][x == -1]
+    return h
+
+def conecta_4(fichas):
+    """
+    Devuelve True si en las fichas (bitboard) hay 4 en línea
+
+    Las direcciones son vertical (1), horizontal (7) y las dos
+    diagonales (6 y 8)
+    """
+    for desp in (1, 7, 6, 8):
+        m = fichas & (fichas >> desp)
+        if m & (m >> (2 * desp)):
+            return True
+    return False
+
+def bitboard_a_tupla(s):
+    """
+    Convierte un estado de Conecta4Bitboard al estado de 42 casillas
+    de Conecta4
+    """
+    x, o, _, _ = s
+    t = [0] * 42
+    for col in range(7):
+        for alt in range(6):
+            bit = 1 << (7 * col + alt)
+            if x & bit:
+                t[col + 7 * (5 - alt)] = 1
+            elif o & bit:
+                t[col + 7 * (5 - alt)] = -1
+    return tuple(t)
+
+def tupla_a_bitboard(t):
+    """
+    Convierte un estado de 42 casillas de Conecta4 a un estado
+    de Conecta4Bitboard
+    """
+    x, o, alturas = 0, 0, [0] * 7
+    for col in range(7):
+        for alt in range(6):
+            v = t[col + 7 * (5 - alt)]
+            if v == 0:
+                break
+            if v == 1:
+                x |= 1 << (7 * col + alt)
+            else:
+                o |= 1 << (7 * col + alt)
+            alturas[col] += 1
+    ganador = 1 if conecta_4(x) else -1 if conecta_4(o) else 0
+    return (x, o, tuple(alturas), ganador)
+
+def compara_nodos_por_segundo(d=6):
+    """
+    Compara los nodos por segundo de Conecta4 y Conecta4Bitboard
+    recorriendo el árbol completo hasta profundidad d
+    """
+    return compara_modelos([Conecta4(), Conecta4Bitboard()], d)
+
 def pprint_conecta4(s):
     a = [' X ' if x == 1 else ' O ' if x == -1 else '   ' 
          for x in s]
@@ -323,15 +514,6 @@ def evaluar_movilidad(estado):
     return valor_movilidad
 
 
-
-# Variable global para almacenar el estado actual del juego
-_estado_actual = None
-
-def set_estado_actual(estado):
-    """Función auxiliar para establecer el estado actual"""
-    global _estado_actual
-    _estado_actual = estado
-
 def contar_conectados(estado, jugador, n):
     """
     Cuenta cuántas líneas de 'n' fichas conectadas tiene el jugador
@@ -406,28 +588,363 @@ def contar_conectados(estado, jugador, n):
     
     return count
 
-def ordena_avanzado(jugadas, jugador):
+def _celda(fila, col):
+    """Índice en la tupla del estado de la casilla (fila, col)"""
+    return fila * 7 + col
+
+def _patrones_conectados(n):
     """
-    Función adaptada para usar con la API de ordenamiento del negamax.
-    Usa el estado global establecido previamente.
+    Patrones de contar_conectados para n < 4: tuplas (casillas, vecinas)
+    que cuentan si todas las casillas son del jugador y alguna vecina
+    está vacía
+    """
+    patrones = []
+    # Horizontales
+    for fila in range(6):
+        for col in range(7-n+1):
+            vecinas = []
+            if col > 0:
+                vecinas.append(_celda(fila, col-1))
+            if col+n < 7:
+                vecinas.append(_celda(fila, col+n))
+            patrones.append(
+                (tuple(_celda(fila, col+i) for i in range(n)), tuple(vecinas))
+            )
+    # Verticales (solo el espacio de arriba)
+    for col in range(7):
+        for fila in range(6-n+1):
+            vecinas = [_celda(fila-1, col)] if fila > 0 else []
+            patrones.append(
+                (tuple(_celda(fila+i, col) for i in range(n)), tuple(vecinas))
+            )
+    # Diagonales ascendentes
+    for fila in range(n-1, 6):
+        for col in range(7-n+1):
+            vecinas = []
+            if col > 0 and fila < 5:
+                vecinas.append(_celda(fila+1, col-1))
+            if col+n < 7 and fila-(n) >= 0:
+                vecinas.append(_celda(fila-n, col+n))
+            patrones.append(
+                (tuple(_celda(fila-i, col+i) for i in range(n)), tuple(vecinas))
+            )
+    # Diagonales descendentes
+    for fila in range(6-n+1):
+        for col in range(7-n+1):
+            vecinas = []
+            if col > 0 and fila > 0:
+                vecinas.append(_celda(fila-1, col-1))
+            if col+n < 7 and fila+n < 6:
+                vecinas.append(_celda(fila+n, col+n))
+            patrones.append(
+                (tuple(_celda(fila+i, col+i) for i in range(n)), tuple(vecinas))
+            )
+    return [p for p in patrones if p[1]]
+
+# Las 69 líneas de 4 casillas de Conecta4 (las mismas que revisa ganancia)
+LINEAS_4 = tuple(
+    [tuple(i + 7 * (j + k) for k in range(4)) for i in range(7) for j in range(3)] +
+    [tuple(7 * i + j + k for k in range(4)) for i in range(6) for j in range(4)] +
+    [tuple(i + 7 * j + 8 * k for k in range(4)) for i in range(4) for j in range(3)] +
+    [tuple(i + 7 * j + 3 + 6 * k for k in range(4)) for i in range(4) for j in range(3)]
+)
+# Patrones de contar_conectados para 2 y 3 fichas
+PATRONES_CONECTADOS = {n: _patrones_conectados(n) for n in (2, 3)}
+# Ternas horizontales de evaluar_estructuras_defensivas
+TERNAS_DEFENSIVAS = tuple(
+    (fila*7 + col-1, fila*7 + col, fila*7 + col+1)
+    for fila in range(6) for col in range(1, 6)
+)
+# Valor de cada casilla para el control del centro de evalua3_avanzada
+VALOR_CENTRO = tuple(
+    (3 if i % 7 == 3 else 2) if i % 7 in (2, 3, 4) else 0 for i in range(42)
+)
+
+
+class EvaluadorConecta4:
+    """
+    Versión incremental de evalua3_avanzada.
+
+    Mantiene un tablero propio y, para cada una de las 69 líneas de 4
+    casillas, cuántas fichas tiene cada jugador. También lleva los
+    totales de cada término de la evaluación (centro, conectados de
+    contar_conectados y bloqueos de evaluar_estructuras_defensivas).
+    Al cambiar una casilla solo se actualizan las líneas y patrones que
+    la contienen, y las amenazas directas se leen de las líneas que
+    pasan por la casilla donde caería la ficha de cada columna.
+
+    El resultado es numéricamente idéntico a evalua3_avanzada: se
+    combinan los mismos conteos con las mismas operaciones en el mismo
+    orden.
+
+    Se puede usar de dos formas:
+
+        - Como función de evaluación: evaluador(s) sincroniza el tablero
+          con el estado s (cambiando solo las casillas distintas) y
+          devuelve la evaluación. Así sirve directamente como evalua en
+          el negamax, donde las hojas consecutivas difieren en pocas
+          casillas.
+        - Con hacer(a, j) / deshacer(a) y valor().
+
+    Cada instancia tiene su propio tablero, así que hay que usar una por
+    búsqueda (o por jugador).
+    """
+    def __init__(self, s=None):
+        self.tablero = [0] * 42
+        self.alturas = [0] * 7
+        self.fichas = 0
+        self.lineas = [[0, 0, 0] for _ in LINEAS_4]
+        self.completas = [0, 0, 0]
+        self.centro = 0
+        self.conectados = {j: {2: 0, 3: 0} for j in (1, -1)}
+        self.bloqueos = {1: 0, -1: 0}
+        if s is not None:
+            self.sincroniza(s)
+
+    def __call__(self, s):
+        self.sincroniza(s)
+        return self.valor()
+
+    def sincroniza(self, s):
+        """Actualiza el tablero para que sea igual al estado s"""
+        tablero = self.tablero
+        for i in range(42):
+            if tablero[i] != s[i]:
+                self._pon(i, s[i])
+
+    def hacer(self, a, j):
+        """Pone una ficha de j en la columna a"""
+        self._pon(a + 7 * (5 - self.alturas[a]), j)
+
+    def deshacer(self, a):
+        """Quita la ficha de arriba de la columna a"""
+        self._pon(a + 7 * (6 - self.alturas[a]), 0)
+
+    def _pon(self, i, x):
+        """Cambia la casilla i al valor x actualizando los conteos"""
+        anterior = self.tablero[i]
+        self._cuenta_patrones(i, -1)
+        if anterior != 0:
+            self.fichas -= 1
+            self.alturas[i % 7] -= 1
+            self.centro -= anterior * VALOR_CENTRO[i]
+            for l in LINEAS_POR_CASILLA[i]:
+                linea = self.lineas[l]
+                if linea[anterior] == 4:
+                    self.completas[anterior] -= 1
+                linea[anterior] -= 1
+        self.tablero[i] = x
+        if x != 0:
+            self.fichas += 1
+            self.alturas[i % 7] += 1
+            self.centro += x * VALOR_CENTRO[i]
+            for l in LINEAS_POR_CASILLA[i]:
+                linea = self.lineas[l]
+                linea[x] += 1
+                if linea[x] == 4:
+                    self.completas[x] += 1
+        self._cuenta_patrones(i, 1)
+
+    def _cuenta_patrones(self, i, signo):
+        """Suma (signo=1) o resta (signo=-1) los patrones que tocan la casilla i"""
+        t = self.tablero
+        for n, casillas, vecinas in PATRONES_POR_CASILLA[i]:
+            j = t[casillas[0]]
+            if (j != 0 and all(t[c] == j for c in casillas) and
+                    any(t[c] == 0 for c in vecinas)):
+                self.conectados[j][n] += signo
+        for a, b, c in TERNAS_POR_CASILLA[i]:
+            if t[a] == t[c] == -t[b] != 0:
+                self.bloqueos[t[b]] += signo
+
+    def ganancia(self):
+        """Como Conecta4.ganancia para el tablero actual"""
+        return 1 if self.completas[1] else -1 if self.completas[-1] else 0
+
+    def amenazas(self, jugador):
+        """Como contar_amenazas_directas para el tablero actual"""
+        amenazas = 0
+        for col in range(7):
+            if self.alturas[col] < 6:
+                i = col + 7 * (5 - self.alturas[col])
+                if any(self.lineas[l][jugador] == 3 for l in LINEAS_POR_CASILLA[i]):
+                    amenazas += 1
+        return amenazas
+
+    def valor(self):
+        """Evaluación del tablero actual para el jugador 1"""
+        if self.fichas == 42 or self.completas[1] or self.completas[-1]:
+            return self.ganancia()
+
+        PESO_CENTRO = 0.3
+        PESO_CONECTADOS = 0.4
+        PESO_AMENAZAS = 0.7
+        PESO_DEFENSAS = 0.5
+
+        valor_centro = self.centro / (6 * 3 * 3)
+
+        j1, j2 = self.conectados[1], self.conectados[-1]
+        valor_conectados = (j1[2] * 0.1 + j1[3] * 0.4) - \
+                           (j2[2] * 0.1 + j2[3] * 0.4)
+        valor_conectados = valor_conectados / 20
+
+        valor_amenazas = (self.amenazas(1) * 0.5) - (self.amenazas(-1) * 0.5)
+        valor_amenazas = valor_amenazas / 7
+
+        valor_defensivo = max(min((self.bloqueos[1] - self.bloqueos[-1]) / 20, 1), -1)
+
+        # En un estado no terminal ninguna jugada lleva a una pérdida
+        # inmediata, así que los dos jugadores tienen la misma movilidad
+        # (las columnas disponibles)
+        valor_movilidad = (7 - 7) / 7
+
+        evaluacion_total = (
+            PESO_CENTRO * valor_centro +
+            PESO_CONECTADOS * valor_conectados +
+            PESO_AMENAZAS * valor_amenazas +
+            PESO_DEFENSAS * valor_defensivo +
+            0.2 * valor_movilidad
+        )
+        return max(min(evaluacion_total, 0.99), -0.99)
+
+
+LINEAS_POR_CASILLA = tuple(
+    tuple(l for l, linea in enumerate(LINEAS_4) if i in linea) for i in range(42)
+)
+PATRONES_POR_CASILLA = tuple(
+    tuple(
+        (n, casillas, vecinas) for n in (2, 3)
+        for casillas, vecinas in PATRONES_CONECTADOS[n]
+        if i in casillas or i in vecinas
+    )
+    for i in range(42)
+)
+TERNAS_POR_CASILLA = tuple(
+    tuple(terna for terna in TERNAS_DEFENSIVAS if i in terna) for i in range(42)
+)
+
+# Evaluación por lotes con NumPy (opcional): los estados son renglones de
+# un arreglo de (N, 42) int8, y cada término de la evaluación se calcula
+# para todos a la vez con matrices de índices de las líneas y patrones
+
+# Las líneas de 3 casillas que revisa evalua_3con, en el mismo orden
+LINEAS_3 = tuple(
+    [(i + 7 * j, i + 7 * (j + 1), i + 7 * (j + 2)) for i in range(7) for j in range(4)] +
+    [(7 * i + j, 7 * i + j + 1, 7 * i + j + 2) for i in range(6) for j in range(5)] +
+    [(i + 7 * j, i + 7 * j + 8, i + 7 * j + 16) for i in range(5) for j in range(4)] +
+    [(i + 7 * j + 3, i + 7 * j + 9, i + 7 * j + 15) for i in range(5) for j in range(4)]
+)
+
+def arreglo_conecta4(estados):
+    """Lista de estados de Conecta4 como arreglo de NumPy de (N, 42) int8"""
+    if np is None:
+        raise ImportError("La evaluación por lotes necesita NumPy")
+    return np.array(estados, dtype=np.int8).reshape(-1, 42)
+
+def _indices_patrones(patrones):
+    """
+    Matrices de índices (casillas, vecinas) de los patrones de
+    contar_conectados. Las vecinas que faltan apuntan a la casilla 42,
+    que se agrega al tablero siempre ocupada
+    """
+    casillas = np.array([c for c, _ in patrones])
+    vecinas = np.array([v + (42,) * (2 - len(v)) for _, v in patrones])
+    return casillas, vecinas
+
+if np is not None:
+    _LINEAS_3 = np.array(LINEAS_3)
+    _LINEAS_4 = np.array(LINEAS_4)
+    # _CASILLA_EN_LINEA[i, l]: la casilla i está en la línea l
+    _CASILLA_EN_LINEA = np.array(
+        [[i in linea for linea in LINEAS_4] for i in range(42)], dtype=np.int8
+    )
+    _PATRONES = {n: _indices_patrones(PATRONES_CONECTADOS[n]) for n in (2, 3)}
+    _TERNAS = np.array(TERNAS_DEFENSIVAS)
+    _VALOR_CENTRO = np.array(VALOR_CENTRO)
+
+def evalua_3con_lote(tableros):
+    """evalua_3con para cada renglón de un arreglo de (N, 42)"""
+    sumas = tableros[:, _LINEAS_3].sum(axis=2)
+    conect3 = (sumas == 3).sum(axis=1) - (sumas == -3).sum(axis=1)
+    return conect3 / (7 * 4 + 6 * 5 + 5 * 4 + 5 * 4)
+
+def evalua3_avanzada_lote(tableros):
+    """
+    evalua3_avanzada para cada renglón de un arreglo de (N, 42)
+
+    Da exactamente los mismos valores: los conteos son enteros y se
+    combinan con las mismas operaciones en el mismo orden.
+    """
+    n = len(tableros)
+    lineas = tableros[:, _LINEAS_4]
+    sumas = lineas.sum(axis=2)
+    gana_1 = (sumas == 4).any(axis=1)
+    gana_2 = (sumas == -4).any(axis=1)
+    terminal = gana_1 | gana_2 | (tableros != 0).all(axis=1)
+    ganancia = np.where(gana_1, 1, np.where(gana_2, -1, 0))
+
+    valor_centro = (tableros @ _VALOR_CENTRO) / (6 * 3 * 3)
+
+    extendido = np.concatenate([tableros, np.ones((n, 1), np.int8)], axis=1)
+    conectados = {}
+    for largo, (casillas, vecinas) in _PATRONES.items():
+        libre = (extendido[:, vecinas] == 0).any(axis=2)
+        for j in (1, -1):
+            conectados[j, largo] = (
+                (extendido[:, casillas] == j).all(axis=2) & libre
+            ).sum(axis=1)
+    valor_conectados = (conectados[1, 2] * 0.1 + conectados[1, 3] * 0.4) - \
+                       (conectados[-1, 2] * 0.1 + conectados[-1, 3] * 0.4)
+    valor_conectados = valor_conectados / 20
+
+    # Casilla donde cae la ficha de cada columna, y si la columna está libre
+    alturas = (tableros.reshape(n, 6, 7) != 0).sum(axis=1)
+    libres = alturas < 6
+    caida = np.arange(7) + 7 * np.maximum(5 - alturas, 0)
+    amenazas = {}
+    for j in (1, -1):
+        con_3 = ((lineas == j).sum(axis=2) == 3).astype(np.int8)
+        gana_en = (con_3 @ _CASILLA_EN_LINEA.T) > 0
+        amenazas[j] = (
+            np.take_along_axis(gana_en, caida, axis=1) & libres
+        ).sum(axis=1)
+    valor_amenazas = (amenazas[1] * 0.5) - (amenazas[-1] * 0.5)
+    valor_amenazas = valor_amenazas / 7
+
+    izq, centro, der = (tableros[:, _TERNAS[:, k]] for k in range(3))
+    bloqueos_j1 = ((izq == -1) & (centro == 1) & (der == -1)).sum(axis=1)
+    bloqueos_j2 = ((izq == 1) & (centro == -1) & (der == 1)).sum(axis=1)
+    valor_defensivo = np.clip((bloqueos_j1 - bloqueos_j2) / 20, -1, 1)
+
+    # Sin pérdidas inmediatas en estados no terminales (ver EvaluadorConecta4)
+    valor_movilidad = (7 - 7) / 7
+
+    evaluacion_total = (
+        0.3 * valor_centro +
+        0.4 * valor_conectados +
+        0.7 * valor_amenazas +
+        0.5 * valor_defensivo +
+        0.2 * valor_movilidad
+    )
+    evaluacion_total = np.clip(evaluacion_total, -0.99, 0.99)
+    return np.where(terminal, ganancia, evaluacion_total)
+
+# Versiones de las evaluaciones que negamax puede usar por lotes. Con a
+# lo más 7 jugadas nunca llegarían a MINIMO_LOTE, así que se evalúan por
+# lotes siempre: son más rápidas que evalua3_avanzada estado por estado,
+# pero más lentas que EvaluadorConecta4 (incremental)
+evalua_3con_lotes = EvaluacionPorLotes(
+    evalua_3con, evalua_3con_lote, arreglo_conecta4, minimo=0
+)
+evalua3_avanzada_lotes = EvaluacionPorLotes(
+    evalua3_avanzada, evalua3_avanzada_lote, arreglo_conecta4, minimo=0
+)
+
+def ordena_avanzado(juego, estado, jugadas, jugador):
+    """
+    Función de ordenamiento con estado para el negamax: recibe el
+    estado del nodo que se está expandiendo.
     """
-    global _estado_actual
-    
-    if _estado_actual is None:
-        # Si no hay estado disponible, volvemos al ordenamiento básico
-        valor_estrategico = {
-            3: 100,  # Columna central
-            2: 80,   # Adyacentes al centro
-            4: 80,
-            1: 60,   # Intermedias
-            5: 60,
-            0: 40,   # Extremos
-            6: 40
-        }
-        return sorted(jugadas, key=lambda x: -valor_estrategico[x])
-    
-    estado = _estado_actual
-    juego = Conecta4()
     puntuaciones = {}
     
     for jugada in jugadas:
@@ -487,15 +1004,16 @@ def ordena_avanzado(jugadas, jugador):
     # Ordenar jugadas por puntuación (mayor primero)
     return sorted(jugadas, key=lambda j: -puntuaciones.get(j, 0))
 
-def negamax_con_estado_actual(juego, s, j, d):
-    """Wrapper para jugador_negamax que incluye el estado actual"""
-    set_estado_actual(s)  # Establecer el estado global
-    return jugador_negamax(juego, s, j, ordena=ordena_avanzado, evalua=evalua3_avanzada, d=d)
+def negamax_con_estado_actual(juego, s, j, d, contexto=None, finales=None):
+    """Wrapper para jugador_negamax con el ordenamiento y la evaluación avanzados"""
+    return jugador_negamax(juego, s, j, ordena=ordena_avanzado, evalua=EvaluadorConecta4(), d=d, contexto=contexto, finales=finales)
+
+def minimax_iter_con_estado_actual(juego, s, j, tiempo, contexto=None, finales=None):
+    """Wrapper para minimax_iterativo con el ordenamiento y la evaluación avanzados"""
+    return minimax_iterativo(juego, s, j, ordena=ordena_avanzado, evalua=EvaluadorConecta4(), tiempo=tiempo, contexto=contexto, finales=finales)
 
-def minimax_iter_con_estado_actual(juego, s, j, tiempo):
-    """Wrapper para minimax_iterativo que incluye el estado actual"""
-    set_estado_actual(s)  # Establecer el estado global
-    return minimax_iterativo(juego, s, j, ordena=ordena_avanzado, evalua=evalua3_avanzada, tiempo=tiempo)
+# Casillas vacías a partir de las cuales los jugadores resuelven el final exacto
+UMBRAL_FINALES = 14
 
 if __name__ == '__main__':
 
@@ -520,26 +1038,30 @@ if __name__ == '__main__':
             d = None
             while type(d) != int or d < 1:
                 d = int(input("Profundidad: "))
-            jugs.append(lambda juego, s, j: jugador_negamax(
-                juego, s, j, ordena=ordena_centro, evalua=evalua_3con, d=d)
+            jugs.append(lambda juego, s, j, d=d, c=ContextoBusqueda(),
+                        f=ResolvedorFinales(UMBRAL_FINALES, ordena_centro): jugador_negamax(
+                juego, s, j, ordena=ordena_centro, evalua=evalua_3con, d=d, contexto=c, finales=f)
             )
         elif sel == 3:
             t = None
             while type(t) != int or t < 1:
                 t = int(input("Tiempo: "))
-            jugs.append(lambda juego, s, j: minimax_iterativo(
-                juego, s, j, ordena=ordena_centro, evalua=evalua_3con, tiempo=t)
+            jugs.append(lambda juego, s, j, t=t, c=ContextoBusqueda(),
+                        f=ResolvedorFinales(UMBRAL_FINALES, ordena_centro): minimax_iterativo(
+                juego, s, j, ordena=ordena_centro, evalua=evalua_3con, tiempo=t, contexto=c, finales=f)
             )
         elif sel == 4:
             d = None
             while type(d) != int or d < 1:
                 d = int(input("Profundidad: "))
-            jugs.append(lambda juego, s, j: negamax_con_estado_actual(juego, s, j, d))
+            jugs.append(lambda juego, s, j, d=d, c=ContextoBusqueda(),
+                        f=ResolvedorFinales(UMBRAL_FINALES, ordena_centro): negamax_con_estado_actual(juego, s, j, d, c, f))
         else:  # sel == 5
             t = None
             while type(t) != int or t < 1:
                 t = int(input("Tiempo: "))
-            jugs.append(lambda juego, s, j: minimax_iter_con_estado_actual(juego, s, j, t))
+            jugs.append(lambda juego, s, j, t=t, c=ContextoBusqueda(),
+                        f=ResolvedorFinales(UMBRAL_FINALES, ordena_centro): minimax_iter_con_estado_actual(juego, s, j, t, c, f))
         
     g, s_final = juega_dos_jugadores(modelo, jugs[0], jugs[1])
     print("\nSE ACABO EL JUEGO\n")
@@ -0,0 +1,140 @@
+"""
+Modulo con la solución exacta de los finales
+
+    1- Base de datos con el valor exacto de todos los estados alcanzables
+       de un juego pequeño (como el gato), en un archivo que se lee con mmap
+    2- Solución exacta (negamax hasta el final) de los estados con pocas
+       casillas vacías, para juegos más grandes como Conecta4
+
+Los dos tienen el método consulta(juego, s, j), que devuelve la jugada de
+juego perfecto para el jugador j en el estado s, o None si no la conocen,
+y se pueden pasar a jugador_negamax o a minimax_iterativo con el parámetro
+finales.
+
+Los estados deben ser tuplas de casillas con 0, 1 y -1 (como en Gato y
+Conecta4).
+
+"""
+from mmap import mmap, ACCESS_READ
+
+from minimax import negamax, ContextoBusqueda
+
+FINALES_FIRMA = b'FINALES1'
+# Valor guardado para los estados que no son alcanzables
+DESCONOCIDO = 255
+
+def codigo_estado(s):
+    """Número en base 3 del estado: el dígito i es s[i] % 3"""
+    codigo = 0
+    for x in reversed(s):
+        codigo = 3 * codigo + x % 3
+    return codigo
+
+
+def genera_base_finales(juego, archivo):
+    """
+    Resuelve todos los estados alcanzables desde inicializa() y guarda
+    su valor exacto (para el jugador 1) en el archivo
+
+    El archivo tiene la firma FINALES_FIRMA, el número de casillas n
+    (1 byte) y 3**n bytes: para cada estado (por su codigo_estado) el
+    valor más 1, o DESCONOCIDO si no es alcanzable
+
+    Regresa
+    -------
+    int: número de estados alcanzables
+
+    """
+    s0, j0 = juego.inicializa()
+    valores = {}
+
+    def resuelve(s, j):
+        codigo = codigo_estado(s)
+        if codigo not in valores:
+            if juego.terminal(s):
+                valores[codigo] = juego.ganancia(s)
+            else:
+                hijos = [
+                    resuelve(juego.transicion(s, a, j), -j)
+                    for a in juego.jugadas_legales(s, j)
+                ]
+                valores[codigo] = max(hijos) if j == 1 else min(hijos)
+        return valores[codigo]
+
+    resuelve(s0, j0)
+    datos = bytearray([DESCONOCIDO]) * 3 ** len(s0)
+    for codigo, v in valores.items():
+        datos[codigo] = v + 1
+    with open(archivo, 'wb') as f:
+        f.write(FINALES_FIRMA + bytes([len(s0)]) + datos)
+    return len(valores)
+
+
+class BaseFinales:
+    """
+    Base de datos de valores exactos escrita con genera_base_finales
+
+    El archivo no se lee completo: se mapea en memoria y cada consulta
+    lee un byte por estado.
+
+    """
+    def __init__(self, archivo):
+        self._archivo = open(archivo, 'rb')
+        self._datos = mmap(self._archivo.fileno(), 0, access=ACCESS_READ)
+        if self._datos[:len(FINALES_FIRMA)] != FINALES_FIRMA:
+            self.cierra()
+            raise ValueError(f"{archivo} no es una base de finales")
+        self.casillas = self._datos[len(FINALES_FIRMA)]
+        self._inicio = len(FINALES_FIRMA) + 1
+
+    def valor(self, s):
+        """Valor exacto de s para el jugador 1, o None si no está"""
+        x = self._datos[self._inicio + codigo_estado(s)]
+        return None if x == DESCONOCIDO else x - 1
+
+    def consulta(self, juego, s, j):
+        """
+        Jugada que maximiza el valor exacto para j, o None si el estado
+        no está en la base
+
+        """
+        if len(s) != self.casillas or self.valor(s) is None:
+            return None
+        return max(
+            juego.jugadas_legales(s, j),
+            key=lambda a: j * self.valor(juego.transicion(s, a, j))
+        )
+
+    def cierra(self):
+        self._datos.close()
+        self._archivo.close()
+
+
+class ResolvedorFinales:
+    """
+    Resuelve exactamente los estados con a lo más umbral casillas
+    vacías, con negamax hasta el final en la ventana (-1, 1) y una
+    tabla de transposición propia que se conserva de una jugada a otra
+
+    """
+    def __init__(self, umbral=10, ordena=None, contexto=None):
+        """
+        umbral (int): máximo de casillas vacías para resolver
+        ordena (function): ordenamiento para el negamax
+        contexto (ContextoBusqueda): contexto para las búsquedas exactas
+
+        """
+        self.umbral = umbral
+        self.ordena = ordena
+        self.contexto = ContextoBusqueda() if contexto is None else contexto
+
+    def consulta(self, juego, s, j):
+        """Jugada perfecta si s tiene pocas casillas vacías, si no None"""
+        if s.count(0) > self.umbral or juego.terminal(s):
+            return None
+        self.contexto.nueva_busqueda()
+        traza, _ = negamax(
+            juego, s, j, alpha=-1, beta=1, ordena=self.ordena, d=None,
+            transp=self.contexto.transp, traza=[], contexto=self.contexto
+        )
+        return traza[0]
@@ -7,12 +7,27 @@ from juegos_simplificado import ModeloJuegoZT2
 from juegos_simplificado import juega_dos_jugadores
 from juegos_simplificado import minimax
 from minimax import jugador_negamax
+from minimax import ContextoBusqueda
+from transposicion import claves_zobrist
+from transposicion import simetrias_cuadrado
+from transposicion import inversas
+from transposicion import zobrist_imagen
+from finales import BaseFinales
+from finales import genera_base_finales
+from os import path
+
+# Archivo con la base de datos de finales del gato
+ARCHIVO_FINALES = path.join(path.dirname(path.abspath(__file__)), 'gato_finales.bin')
 
 class Gato(ModeloJuegoZT2):
     """
     El juego del gato 
 
     """
+    ZOBRIST = claves_zobrist(9)
+    SIMETRIAS = simetrias_cuadrado(3)
+    SIMETRIA_INVERSA = inversas(SIMETRIAS)
+
     def inicializa(self):
         """
         Inicializa el juego del gato
@@ -71,6 +86,71 @@ class Gato(ModeloJuegoZT2):
             if s[i] == s[i + 3] == s[i + 6] != 0:
                 return s[i]
         return 0    
+
+    def zobrist(self, s):
+        """
+        Hash de Zobrist del estado s
+
+        """
+        h = 0
+        for i, x in enumerate(s):
+            if x != 0:
+                h ^= self.ZOBRIST[i][x == -1]
+        return h
+
+    def zobrist_transicion(self, h, s, a, j, s_nuevo):
+        """
+        Hash de Zobrist de s_nuevo = transicion(s, a, j) a partir del
+        hash h de s
+
+        """
+        return h ^ self.ZOBRIST[a][j == -1]
+
+    def zobrist_simetrias(self, s):
+        """
+        Hash de Zobrist de la imagen de s bajo cada una de las 8
+        simetrías del tablero (ver ConSimetrias)
+
+        """
+        return tuple(zobrist_imagen(self.ZOBRIST, s, p) for p in self.SIMETRIAS)
+
+    def zobrist_simetrias_transicion(self, hs, s, a, j, s_nuevo):
+        """
+        zobrist_simetrias de s_nuevo = transicion(s, a, j) a partir de
+        hs = zobrist_simetrias(s)
+
+        """
+        return tuple(
+            h ^ self.ZOBRIST[p[a]][j == -1] for h, p in zip(hs, self.SIMETRIAS)
+        )
+
+    def simetria_jugada(self, a, k):
+        """
+        Imagen de la jugada a bajo la simetría k
+
+        """
+        return self.SIMETRIAS[k][a]
+
+    def mutable(self, s):
+        """
+        Copia mutable del estado s (una lista)
+
+        """
+        return list(s)
+
+    def hacer(self, estado, a, j):
+        """
+        Realiza la jugada a del jugador j en el estado mutable
+
+        """
+        estado[a] = j
+
+    def deshacer(self, estado, a, j):
+        """
+        Revierte la jugada a del jugador j en el estado mutable
+
+        """
+        estado[a] = 0
     
 def pprint_gato(s):
     """
@@ -107,6 +187,17 @@ def jugador_minimax_gato(juego, s, j):
     """
     return minimax(juego, s, j)
 
+
+def base_finales_gato(archivo=ARCHIVO_FINALES):
+    """
+    Base de datos con el valor exacto de todos los estados del gato.
+    Si el archivo no existe, se genera (son unos 5,500 estados)
+
+    """
+    if not path.exists(archivo):
+        genera_base_finales(Gato(), archivo)
+    return BaseFinales(archivo)
+
     
 def juega_gato(jugador='X'):
     """
@@ -116,16 +207,21 @@ def juega_gato(jugador='X'):
     if jugador not in ['X', 'O']:
         raise ValueError("El jugador solo puede tener los valores 'X' o 'O'")
     juego = Gato()
+    contexto = ContextoBusqueda()
+    finales = base_finales_gato()
+
+    def jugador_negamax_gato(juego, s, j):
+        return jugador_negamax(juego, s, j, contexto=contexto, finales=finales)
     
     print("El juego del gato")
     print(f"Las 'X' siempre empiezan y tu juegas con {jugador}")
     
     if jugador == 'X':
         #g, s = juega_dos_jugadores(juego, jugador_manual_gato, jugador_minimax_gato)
-        g, s = juega_dos_jugadores(juego, jugador_manual_gato, jugador_negamax)
+        g, s = juega_dos_jugadores(juego, jugador_manual_gato, jugador_negamax_gato)
     else:
         #g, s = juega_dos_jugadores(juego, jugador_minimax_gato, jugador_manual_gato)
-        g, s = juega_dos_jugadores(juego, jugador_negamax, jugador_manual_gato)
+        g, s = juega_dos_jugadores(juego, jugador_negamax_gato, jugador_manual_gato)
     
     print("\nSE ACABO EL JUEGO\n")
     pprint_gato(s)   
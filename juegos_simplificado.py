@@ -6,12 +6,31 @@ Vamos a usar una orientación funcional en este modulo
 """
 
 from random import shuffle
+from time import perf_counter
     
 class ModeloJuegoZT2:
     """
     Clase abstracta para juegos de suma cero, por turnos, dos jugadores.
     
     Se asumen que los jugadores son 1 y -1
+
+    Opcionalmente, un juego puede implementar zobrist(s) y
+    zobrist_transicion(h, s, a, j, s_nuevo) para que el negamax use hashing
+    de Zobrist incremental en la tabla de transposición (ver el módulo
+    transposicion).
+
+    También puede implementar el protocolo de estado mutable, para que el
+    negamax no copie el estado en cada nodo:
+
+        mutable(s): copia mutable del estado s, que se puede usar en
+            lugar de s en el resto de los métodos
+        hacer(estado, a, j): realiza la jugada a del jugador j
+            modificando el estado mutable
+        deshacer(estado, a, j): revierte la jugada a del jugador j, que
+            debe ser la última que se hizo en el estado
+
+    Si además usa hashing de Zobrist, zobrist_transicion se llama antes
+    de hacer la jugada con s_nuevo=None.
     
     """
     def inicializa(self):
@@ -55,16 +74,18 @@ class ModeloJuegoZT2:
         raise NotImplementedError("Hay que desarrollar este método, pues")
 
 
-def juega_dos_jugadores(juego, jugador1, jugador2):
+def juega_dos_jugadores(juego, jugador1, jugador2, inicial=None):
     """
     Juega un juego de dos jugadores
     
     juego: instancia de ModeloJuegoZT
     jugador1: función que recibe el estado y devuelve la jugada
     jugador2: función que recibe el estado y devuelve la jugada
+    inicial: (estado, jugador) desde donde se juega, por ejemplo después
+        de una apertura. Si None, el de juego.inicializa()
     
     """
-    s, j = juego.inicializa()
+    s, j = juego.inicializa() if inicial is None else inicial
     while not juego.terminal(s):
         a = jugador1(juego, s, j) if j == 1 else jugador2(juego, s, j)
         s = juego.transicion(s, a, j)
@@ -72,6 +93,43 @@ def juega_dos_jugadores(juego, jugador1, jugador2):
     return juego.ganancia(s), s
 
 
+def cuenta_nodos(juego, s, j, d):
+    """
+    Cuenta los nodos del árbol completo de juego hasta profundidad d
+    (sin poda), usando solo la interfaz de ModeloJuegoZT2
+    
+    """
+    if d == 0 or juego.terminal(s):
+        return 1
+    return 1 + sum(
+        cuenta_nodos(juego, juego.transicion(s, a, j), -j, d - 1)
+        for a in juego.jugadas_legales(s, j)
+    )
+
+
+def compara_modelos(juegos, d):
+    """
+    Compara los nodos por segundo de varios modelos del mismo juego
+    recorriendo el árbol completo hasta profundidad d desde el estado
+    inicial. Todos deben generar el mismo número de nodos.
+    
+    devuelve: diccionario nombre del modelo -> (nodos, tiempo, nodos/s)
+    
+    """
+    resultados = {}
+    for juego in juegos:
+        s0, j0 = juego.inicializa()
+        t0 = perf_counter()
+        nodos = cuenta_nodos(juego, s0, j0, d)
+        t = perf_counter() - t0
+        resultados[type(juego).__name__] = (nodos, t, nodos / t)
+        print(f"{type(juego).__name__:26} nodos: {nodos:9d}  "
+              f"tiempo: {t:7.3f}s  nodos/s: {nodos / t:10.0f}")
+    nps = [r[2] for r in resultados.values()]
+    print(f"Aceleración: {nps[-1] / nps[0]:.2f}x")
+    return resultados
+
+
 def minimax(juego, estado, jugador):
     """
     Devuelve la mejor jugada para el jugador en el estado
@@ -0,0 +1,217 @@
+"""
+Modulo con el libro de aperturas
+
+    1- Generación del libro: búsquedas negamax profundas (fuera de línea)
+       de todas las posiciones a las que se llega desde inicializa() en
+       unas cuantas jugadas
+    2- Archivo binario compacto con las jugadas del libro
+    3- Jugador que responde con el libro mientras la posición esté en él
+
+Las posiciones se identifican con el hash de Zobrist del juego, y se
+normalizan con las simetrías del tablero: todos los estados simétricos
+comparten la misma entrada (la del hash menor). Para eso el juego debe
+implementar, además de zobrist(s), los métodos que usa ConSimetrias
+(ver transposicion.py)
+
+    zobrist_simetrias(s): los hash de la imagen de s bajo cada simetría
+    simetria_jugada(a, k): la imagen de la jugada a bajo la simetría k
+    SIMETRIA_INVERSA: el índice de la simetría inversa de cada una
+
+Si el juego no tiene simetrías, el libro funciona sin normalizar.
+
+El archivo empieza con la firma LIBRO_FIRMA y el número de entradas
+(entero de 4 bytes), seguido de las entradas ordenadas por clave, de 14
+bytes cada una: clave (8 bytes), jugada (2 bytes, como en
+TablaCompartida) y valor (float de 4 bytes) para el jugador en turno.
+
+Uso desde la línea de comandos:
+
+    python libro.py conecta4 libro_conecta4.bin --jugadas 4 --d 8
+
+"""
+from struct import calcsize, pack, unpack_from
+
+from minimax import negamax, ContextoBusqueda
+from transposicion import codifica_jugada, decodifica_jugada
+
+LIBRO_FIRMA = b'LIBRO1'
+FORMATO_ENTRADA = '<Qhf'
+TAM_ENTRADA = calcsize(FORMATO_ENTRADA)
+
+def clave_libro(juego, s):
+    """
+    Clave normalizada del estado s
+
+    Regresa
+    -------
+    tuple: (clave, k) donde k es el índice de la simetría cuyo hash es
+        la clave (hay que aplicarla a las jugadas), 0 si no se normaliza
+
+    """
+    if not hasattr(juego, 'zobrist_simetrias'):
+        return juego.zobrist(s), 0
+    claves = juego.zobrist_simetrias(s)
+    k = min(range(len(claves)), key=claves.__getitem__)
+    return claves[k], k
+
+
+class LibroAperturas:
+    """
+    Libro de aperturas: para cada posición (normalizada), la jugada que
+    encontró la búsqueda y su valor para el jugador en turno
+
+    """
+    def __init__(self, entradas=None):
+        """
+        entradas (dict): clave normalizada -> (jugada, valor), con la
+            jugada en la orientación de la clave
+
+        """
+        self.entradas = {} if entradas is None else entradas
+
+    def __len__(self):
+        return len(self.entradas)
+
+    def agrega(self, juego, s, a, v):
+        """Agrega al libro la jugada a con valor v para el estado s"""
+        clave, k = clave_libro(juego, s)
+        if k:
+            a = juego.simetria_jugada(a, k)
+        self.entradas[clave] = (a, v)
+
+    def consulta(self, juego, s):
+        """
+        Jugada del libro para el estado s, o None si no está en el libro
+
+        """
+        clave, k = clave_libro(juego, s)
+        entrada = self.entradas.get(clave)
+        if entrada is None:
+            return None
+        a = entrada[0]
+        return juego.simetria_jugada(a, juego.SIMETRIA_INVERSA[k]) if k else a
+
+    def guarda(self, archivo):
+        """Escribe el libro en un archivo binario"""
+        with open(archivo, 'wb') as f:
+            f.write(LIBRO_FIRMA + pack('<I', len(self.entradas)))
+            for clave in sorted(self.entradas):
+                a, v = self.entradas[clave]
+                f.write(pack(FORMATO_ENTRADA, clave, codifica_jugada(a), v))
+
+    @classmethod
+    def carga(cls, archivo):
+        """Lee un libro escrito con guarda"""
+        with open(archivo, 'rb') as f:
+            datos = f.read()
+        if not datos.startswith(LIBRO_FIRMA):
+            raise ValueError(f"{archivo} no es un libro de aperturas")
+        desp = len(LIBRO_FIRMA)
+        (n,) = unpack_from('<I', datos, desp)
+        desp += 4
+        entradas = {}
+        for _ in range(n):
+            clave, a, v = unpack_from(FORMATO_ENTRADA, datos, desp)
+            entradas[clave] = (decodifica_jugada(a), v)
+            desp += TAM_ENTRADA
+        return cls(entradas)
+
+
+def genera_libro(juego, jugadas=4, d=8, ordena=None, evalua=None,
+                 contexto=None, pvs=True, progreso=False):
+    """
+    Genera el libro con todas las posiciones no terminales a las que se
+    llega desde inicializa() en menos de jugadas jugadas (de cualquiera
+    de los dos jugadores), buscando cada una con negamax a profundidad d
+
+    Las posiciones simétricas se buscan una sola vez. Todas las
+    búsquedas comparten la tabla de transposición del contexto.
+
+    Parametros
+    ----------
+    juego (ModeloJuegoZT2): juego con zobrist (y de preferencia
+        zobrist_simetrias)
+    jugadas (int): número de jugadas desde el inicio que cubre el libro
+    d (int): profundidad de cada búsqueda
+    ordena, evalua, pvs: como en negamax (ordena no debe ser aleatorio)
+    contexto (ContextoBusqueda): contexto para las búsquedas
+    progreso (bool): imprimir el avance por nivel
+
+    Regresa
+    -------
+    LibroAperturas
+
+    """
+    if contexto is None:
+        contexto = ContextoBusqueda()
+    libro = LibroAperturas()
+    s0, j0 = juego.inicializa()
+    nivel = {clave_libro(juego, s0)[0]: (s0, j0)}
+    for ply in range(jugadas):
+        siguiente = {}
+        for s, j in nivel.values():
+            contexto.nueva_busqueda()
+            traza, v = negamax(
+                juego, s, j, ordena=ordena, d=d, evalua=evalua,
+                transp=contexto.transp, traza=[], contexto=contexto, pvs=pvs
+            )
+            libro.agrega(juego, s, traza[0], v)
+            if ply + 1 < jugadas:
+                for a in juego.jugadas_legales(s, j):
+                    s_nuevo = juego.transicion(s, a, j)
+                    if not juego.terminal(s_nuevo):
+                        clave = clave_libro(juego, s_nuevo)[0]
+                        siguiente.setdefault(clave, (s_nuevo, -j))
+        if progreso:
+            print(f"jugada {ply}: {len(nivel)} posiciones, "
+                  f"{len(libro)} en el libro")
+        nivel = siguiente
+    return libro
+
+
+def jugador_con_libro(libro, jugador):
+    """
+    Jugador que usa la jugada del libro mientras la posición esté en él
+    (y la jugada sea legal), y si no, la del jugador dado
+
+    libro (LibroAperturas o str): el libro o el archivo donde está
+    jugador (function): jugador(juego, s, j) para fuera del libro
+
+    """
+    if isinstance(libro, str):
+        libro = LibroAperturas.carga(libro)
+
+    def jugador_libro(juego, s, j):
+        a = libro.consulta(juego, s)
+        if a is not None and a in juego.jugadas_legales(s, j):
+            return a
+        return jugador(juego, s, j)
+    return jugador_libro
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Genera un libro de aperturas")
+    parser.add_argument('juego', choices=['conecta4', 'ultimate'])
+    parser.add_argument('archivo')
+    parser.add_argument('--jugadas', type=int, default=4,
+                        help="jugadas desde el inicio que cubre el libro")
+    parser.add_argument('--d', type=int, default=8,
+                        help="profundidad de cada búsqueda")
+    args = parser.parse_args()
+
+    if args.juego == 'conecta4':
+        from conect4 import Conecta4, EvaluadorConecta4, ordena_avanzado
+        juego, ordena, evalua = Conecta4(), ordena_avanzado, EvaluadorConecta4()
+    else:
+        from ultimate_tictaetoe import UltimateTicTacToe
+        from ultimate_tictaetoe import ordena_con_estado_actual
+        from ultimate_tictaetoe import evalua_avanzada_ultimate
+        juego = UltimateTicTacToe()
+        ordena, evalua = ordena_con_estado_actual, evalua_avanzada_ultimate
+    libro = genera_libro(
+        juego, args.jugadas, args.d, ordena, evalua, progreso=True
+    )
+    libro.guarda(args.archivo)
+    print(f"{len(libro)} posiciones guardadas en {args.archivo}")
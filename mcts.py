@@ -0,0 +1,232 @@
+"""
+Modulo con la búsqueda de árbol Monte Carlo (MCTS) con UCT
+
+    1- Selección con UCB1 (UCT), expansión de una jugada por simulación
+    2- Simulaciones con jugadas al azar usando jugadas_legales y
+       transicion del modelo (o hacer, si tiene el protocolo mutable)
+    3- Modos limitados en tiempo o en número de simulaciones
+    4- Reutilización del árbol entre jugadas
+
+No necesita función de evaluación ni de ordenamiento, así que es una
+alternativa a negamax en juegos como UltimateTicTacToe, con muchas
+jugadas por estado y sin una buena evaluación estática.
+
+"""
+from math import log, sqrt
+from random import choice, randrange
+from time import time
+
+# Constante de exploración de UCB1
+C_UCT = sqrt(2)
+
+class NodoMCTS:
+    """
+    Nodo del árbol: un estado, el jugador en turno, y las estadísticas
+    de las simulaciones que pasaron por él. puntos es la suma de lo que
+    obtuvo en ellas (1, 0.5 o 0) el jugador que hizo la jugada del nodo,
+    es decir, -jugador
+
+    """
+    __slots__ = (
+        'estado', 'jugador', 'jugada', 'padre', 'hijos', 'por_expandir',
+        'visitas', 'puntos'
+    )
+
+    def __init__(self, juego, estado, jugador, jugada=None, padre=None):
+        self.estado = estado
+        self.jugador = jugador
+        self.jugada = jugada
+        self.padre = padre
+        self.hijos = []
+        self.por_expandir = (
+            [] if juego.terminal(estado)
+            else list(juego.jugadas_legales(estado, jugador))
+        )
+        self.visitas = 0
+        self.puntos = 0.0
+
+    def selecciona(self, c):
+        """Hijo con el mayor valor de UCB1"""
+        log_n = log(self.visitas)
+        return max(
+            self.hijos,
+            key=lambda h: h.puntos / h.visitas + c * sqrt(log_n / h.visitas)
+        )
+
+    def expande(self, juego):
+        """Crea el hijo de una de las jugadas sin expandir (al azar)"""
+        i = randrange(len(self.por_expandir))
+        self.por_expandir[i], self.por_expandir[-1] = (
+            self.por_expandir[-1], self.por_expandir[i]
+        )
+        a = self.por_expandir.pop()
+        hijo = NodoMCTS(
+            juego, juego.transicion(self.estado, a, self.jugador),
+            -self.jugador, a, self
+        )
+        self.hijos.append(hijo)
+        return hijo
+
+
+def selecciona_hoja(raiz, juego, c, virtual=False):
+    """
+    Baja desde la raíz eligiendo con UCB1 hasta un nodo con jugadas sin
+    expandir (y expande una) o terminal: el nodo donde simular
+
+    Si virtual, cada nodo del camino cuenta desde ya una visita sin
+    puntos (pérdida virtual), para que las selecciones que se hagan antes
+    de que llegue el resultado tomen otros caminos (ver retropropaga)
+
+    """
+    nodo = raiz
+    while not nodo.por_expandir and nodo.hijos:
+        nodo = nodo.selecciona(c)
+    if nodo.por_expandir:
+        nodo = nodo.expande(juego)
+    if virtual:
+        camino = nodo
+        while camino is not None:
+            camino.visitas += 1
+            camino = camino.padre
+    return nodo
+
+
+def retropropaga(nodo, g, n=1, virtual=False):
+    """
+    Agrega al nodo y a sus ancestros n simulaciones cuyas ganancias (para
+    el jugador 1) suman g. Si virtual, una de las visitas ya se contó
+    como pérdida virtual en selecciona_hoja
+
+    """
+    visitas = n - 1 if virtual else n
+    while nodo is not None:
+        nodo.visitas += visitas
+        nodo.puntos += (n - nodo.jugador * g) / 2
+        nodo = nodo.padre
+
+
+def simulacion(juego, estado, jugador):
+    """
+    Juega al azar desde el estado hasta el final
+
+    Regresa
+    -------
+    int: la ganancia del estado final (para el jugador 1)
+
+    """
+    if hasattr(juego, 'hacer'):
+        estado = juego.mutable(estado)
+        while not juego.terminal(estado):
+            juego.hacer(
+                estado, choice(list(juego.jugadas_legales(estado, jugador))),
+                jugador
+            )
+            jugador = -jugador
+    else:
+        while not juego.terminal(estado):
+            estado = juego.transicion(
+                estado, choice(list(juego.jugadas_legales(estado, jugador))),
+                jugador
+            )
+            jugador = -jugador
+    return juego.ganancia(estado)
+
+
+class ArbolMCTS:
+    """
+    Árbol de búsqueda que se conserva de una jugada a otra
+
+    Se crea uno por jugador y se pasa a jugador_mcts en cada jugada (como
+    un ContextoBusqueda para negamax). Al comenzar cada búsqueda se
+    busca el estado actual entre los nietos de la raíz anterior (el
+    estado después de la jugada propia y la del contrario), y si está,
+    su subárbol es la nueva raíz con todas sus simulaciones.
+
+    """
+    def __init__(self, c=C_UCT):
+        """
+        c (float): constante de exploración de UCB1
+
+        """
+        self.c = c
+        self.raiz = None
+        self.simulaciones = 0
+
+    def reusa(self, juego, estado, jugador):
+        """
+        Pone como raíz el nodo del estado (reutilizado si se encuentra)
+
+        Regresa
+        -------
+        bool: True si se reutilizó un subárbol
+
+        """
+        candidatos = [] if self.raiz is None else [self.raiz] + [
+            nieto for hijo in self.raiz.hijos for nieto in hijo.hijos
+        ]
+        for nodo in candidatos:
+            if nodo.jugador == jugador and nodo.estado == estado:
+                nodo.padre = None
+                self.raiz = nodo
+                return True
+        self.raiz = NodoMCTS(juego, estado, jugador)
+        return False
+
+    def busca(self, juego, estado, jugador, tiempo=None, simulaciones=None):
+        """
+        Hace simulaciones desde el estado hasta que se acaba el tiempo o
+        se llega al número de simulaciones (lo que pase primero; al menos
+        uno de los dos debe darse)
+
+        Regresa
+        -------
+        la jugada de la raíz con más visitas
+
+        """
+        if tiempo is None and simulaciones is None:
+            raise ValueError("Se necesita tiempo o simulaciones")
+        limite = None if tiempo is None else time() + tiempo
+        self.reusa(juego, estado, jugador)
+        raiz, c = self.raiz, self.c
+        n = 0
+        while ((simulaciones is None or n < simulaciones) and
+               (limite is None or time() < limite)):
+            nodo = selecciona_hoja(raiz, juego, c)
+            retropropaga(nodo, simulacion(juego, nodo.estado, nodo.jugador))
+            n += 1
+        self.simulaciones = n
+        return self.mejor_jugada(juego)
+
+    def mejor_jugada(self, juego):
+        """La jugada de la raíz con más visitas"""
+        if not self.raiz.hijos:
+            self.raiz.expande(juego)
+        return max(self.raiz.hijos, key=lambda h: h.visitas).jugada
+
+    def visitas_raiz(self):
+        """dict jugada -> (visitas, puntos) de los hijos de la raíz"""
+        return {h.jugada: (h.visitas, h.puntos) for h in self.raiz.hijos}
+
+
+def jugador_mcts(
+    juego, estado, jugador, tiempo=None, simulaciones=None, c=C_UCT,
+    arbol=None
+    ):
+    """
+    Devuelve la jugada para el jugador en el estado con MCTS
+
+    Parametros
+    ----------
+    tiempo (float): segundos para simular
+    simulaciones (int): número de simulaciones. Si tiempo y simulaciones
+        son None, se usa un segundo
+    c (float): constante de exploración (si no se da arbol)
+    arbol (ArbolMCTS): árbol a reutilizar entre jugadas. Si None, se
+        busca con un árbol nuevo
+
+    """
+    if tiempo is None and simulaciones is None:
+        tiempo = 1
+    if arbol is None:
+        arbol = ArbolMCTS(c)
+    return arbol.busca(juego, estado, jugador, tiempo, simulaciones)
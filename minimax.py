@@ -6,16 +6,34 @@ Modulo con el minimax con algunos los poderes
     3- Evaluacion de estados
     4- Busqueda iterativa
     5- Tablas de transposicion
-    6- Trazabilidad
+    6- Trazabilidad y estadísticas de la búsqueda
+    7- Evaluacion por lotes de las hojas (experimental: pierde la poda
+       entre las hojas y suele ser más lenta que evaluar una a una)
+
+La versión sin recursión (pila explícita), experimental, está en
+minimax_pila.
 """
+from functools import lru_cache
+from inspect import signature
+from json import dumps
 from random import shuffle
-from time import time
+from time import perf_counter, time
+from uuid import uuid4
+from transposicion import TablaTransposicion
+from transposicion import EXACTO, INFERIOR, SUPERIOR
+
+# Ancho de la ventana nula de la búsqueda de variante principal
+VENTANA_NULA = 1e-6
+
+# Jugadas a partir de las cuales EvaluacionPorLotes evalúa por lotes
+MINIMO_LOTE = 20
 
 def negamax(
     juego, estado, jugador,
     alpha=-1e10, beta=1e10, ordena=None, 
     d=None, evalua=None,
-    transp={}, traza=[]
+    transp={}, traza=[], clave=None,
+    contexto=None, ply=0, pvs=False
     ):
     """
     Devuelve la mejor jugada para el jugador en el estado
@@ -27,97 +45,835 @@ def negamax(
     jugador (-1, 1): Jugador que realiza la jugada
     alpha (float): Limite inferior
     beta (float): Limite superior
-    ordena (function:) Funcion de ordenamiento
-        si None, ordena aleatoriamente
+    ordena (function:) Funcion de ordenamiento, ordena(jugadas, jugador)
+        u ordena(juego, estado, jugadas, jugador) si necesita conocer
+        el estado del nodo. Si None, ordena aleatoriamente
     d (int): Profundidad. 
         Si None, busca hasta el final
     evalua: function de evaluación
-        Siempre evalua para el jugador 1
-    transp (dict): Tabla de transposición
+        Siempre evalua para el jugador 1. Si además tiene un método
+        lote(estados) (ver EvaluacionPorLotes), en los nodos con d == 1
+        y al menos evalua.minimo jugadas todos los hijos se evalúan en
+        una sola llamada
+    transp (dict o TablaTransposicion): Tabla de transposición,
+        con entradas (valor, profundidad, cota, mejor jugada)
     traza (list): Trazabilidad
+    clave: Clave del estado en transp. Si None, se calcula con
+        juego.zobrist si el juego lo tiene, si no es el propio estado
+    contexto (ContextoBusqueda): Si tiene limite, la búsqueda revisa el
+        reloj cada contexto.revisa_cada nodos y lanza TiempoAgotado
+        al pasarse. En la raíz guarda en contexto.parcial la mejor
+        traza encontrada hasta el momento. También aporta las jugadas
+        asesinas y la heurística de historia al ordenamiento
+    ply (int): Distancia a la raíz de la búsqueda
+    pvs (bool): Si True, búsqueda de variante principal: solo la primera
+        jugada se busca con la ventana completa, las demás con una
+        ventana nula y se vuelven a buscar si la superan
+
+    Si el juego tiene hacer y deshacer (y zobrist), la búsqueda trabaja
+    sobre una sola copia mutable del estado, en lugar de crear un estado
+    nuevo en cada nodo (ver ModeloJuegoZT2). Las funciones de
+    ordenamiento y evaluación reciben entonces ese estado mutable, y no
+    deben guardarlo.
+
+    Si el contexto tiene estadisticas (ver EstadisticasBusqueda), la
+    búsqueda las va llenando.
     
     Regresa
     -------
     tuple: (lista mejores jugadas, valor)
     
     """
+    valida_parametros(ordena, d, evalua, transp, traza, contexto)
+    if contexto != None and contexto.estadisticas != None:
+        juego, ordena, evalua, transp = contexto.estadisticas.instrumenta(
+            juego, ordena, evalua, transp
+        )
+    zobrist = hasattr(juego, 'zobrist')
+    mutable = zobrist and hasattr(juego, 'hacer')
+    if mutable:
+        estado = juego.mutable(estado)
+    return _negamax(
+        juego, estado, jugador, alpha, beta, ordena, d, evalua,
+        transp, traza, clave, contexto, ply, pvs,
+        zobrist, mutable, minimo_lote(evalua)
+    )
+
+
+def valida_parametros(ordena, d, evalua, transp, traza, contexto):
+    """Revisa los parámetros de negamax, lanza ValueError si no son válidos"""
     if d != None and evalua == None:
         raise ValueError("Se necesita evalua si d no es None")
-    if type(ordena) != type(None) and type(ordena) != type(lambda x: x):
+    if ordena != None and not callable(ordena):
         raise ValueError("ordena debe ser una función")
-    if type(evalua) != type(None) and type(evalua) != type(lambda x: x):
+    if evalua != None and not callable(evalua):
         raise ValueError("evalua debe ser una función")
-    if type(transp) != dict:
-        raise ValueError("transp debe ser un diccionario")
+    if type(transp) != dict and not isinstance(transp, TablaTransposicion):
+        raise ValueError(
+            "transp debe ser un diccionario o una TablaTransposicion"
+        )
     if type(traza) != list: 
         raise ValueError("traza debe ser una lista")
+    if contexto != None and not isinstance(contexto, ContextoBusqueda):
+        raise ValueError("contexto debe ser un ContextoBusqueda")
+
+
+def _negamax(
+    juego, estado, jugador, alpha, beta, ordena, d, evalua,
+    transp, traza, clave, contexto, ply, pvs, zobrist, mutable, lote
+    ):
+    """
+    Núcleo recursivo de negamax, sin revisar los parámetros. Lo que no
+    cambia de un nodo a otro se calcula una vez en negamax: zobrist y
+    mutable (si el juego tiene zobrist, y además hacer; entonces estado
+    ya es la copia mutable) y lote (ver minimo_lote)
+
+    """
+    if contexto != None:
+        contexto.nodos += 1
+        if (contexto.limite != None and
+                contexto.nodos % contexto.revisa_cada == 0 and
+                time() > contexto.limite):
+            raise TiempoAgotado()
 
     if juego.terminal(estado):
         return [], jugador * juego.ganancia(estado)
     if d == 0:
         return [], jugador * evalua(estado)
-    if d != None and estado in transp and transp[estado][1] >= d:
-        return [], transp[estado][0]
+    if clave is None:
+        clave = juego.zobrist(estado) if zobrist else estado
+    entrada = transp.get(clave)
+    a_tt = None
+    if entrada is not None:
+        v_tt, d_tt, cota, a_tt = entrada
+        if d_tt is None or (d is not None and d_tt >= d):
+            if cota == INFERIOR:
+                alpha = max(alpha, v_tt)
+            elif cota == SUPERIOR:
+                beta = min(beta, v_tt)
+            if cota == EXACTO or alpha >= beta:
+                traza.clear()
+                return [a_tt], v_tt
+    alpha_0 = alpha
     
     v = -1e10
     jugadas = list(juego.jugadas_legales(estado, jugador))
     if ordena != None:
-        jugadas = ordena(jugadas, jugador)
+        jugadas = ordena_jugadas(ordena, juego, estado, jugadas, jugador)
     else:
         shuffle(jugadas)
+    if contexto != None:
+        jugadas = contexto.ordena_jugadas(jugadas, ply)
+    if a_tt in jugadas:
+        jugadas = [a_tt] + [a for a in jugadas if a != a_tt]
     if traza:
         a_pref = traza.pop(0)
         if a_pref in jugadas:
             jugadas = [a_pref] + [a for a in jugadas if a != a_pref]
-    for a in jugadas:
-        traza_actual, v2 = negamax(
-            juego, juego.transicion(estado, a, jugador), -jugador, 
-            -beta, -alpha, ordena, d if d == None else d - 1, 
-            evalua, transp, traza
-        )
-        v2 = -v2
+    hojas = None
+    if d == 1 and lote is not None and len(jugadas) >= lote:
+        hojas = evalua_hojas(juego, estado, jugadas, jugador, evalua, contexto)
+    for i, a in enumerate(jugadas):
+        if hojas is not None:
+            traza_actual, v2 = [], hojas[i]
+        else:
+            if mutable:
+                clave_nueva = juego.zobrist_transicion(
+                    clave, estado, a, jugador, None
+                )
+                juego.hacer(estado, a, jugador)
+                estado_nuevo = estado
+            else:
+                estado_nuevo = juego.transicion(estado, a, jugador)
+                clave_nueva = (
+                    juego.zobrist_transicion(
+                        clave, estado, a, jugador, estado_nuevo
+                    ) if zobrist else None
+                )
+            if pvs and i > 0:
+                traza_actual, v2 = _negamax(
+                    juego, estado_nuevo, -jugador,
+                    -alpha - VENTANA_NULA, -alpha, ordena,
+                    d if d == None else d - 1,
+                    evalua, transp, traza, clave_nueva, contexto, ply + 1, pvs,
+                    zobrist, mutable, lote
+                )
+                v2 = -v2
+            if not pvs or i == 0 or alpha < v2 < beta:
+                traza_actual, v2 = _negamax(
+                    juego, estado_nuevo, -jugador, 
+                    -beta, -alpha, ordena, d if d == None else d - 1, 
+                    evalua, transp, traza, clave_nueva, contexto, ply + 1, pvs,
+                    zobrist, mutable, lote
+                )
+                v2 = -v2
+            if mutable:
+                juego.deshacer(estado, a, jugador)
         if v2 > v:
             v = v2
             mejor = a
             mejores = traza_actual[:]
+            if ply == 0 and contexto != None and v2 > alpha:
+                contexto.parcial = [mejor] + mejores
         if v >= beta:
+            if contexto != None:
+                contexto.registra_corte(a, ply, d)
             break
         if v > alpha:
             alpha = v
-    transp[estado] = (v, d)
+    if v <= alpha_0:
+        cota = SUPERIOR
+    elif v >= beta:
+        cota = INFERIOR
+    else:
+        cota = EXACTO
+    transp[clave] = (v, d, cota, mejor)
     return [mejor] + mejores, v 
 
 
+def minimo_lote(evalua):
+    """
+    Número de jugadas a partir del cual negamax evalúa por lotes a los
+    hijos de un nodo con d == 1 (evalua.minimo), o None si evalua no
+    tiene lote
+
+    """
+    if not hasattr(evalua, 'lote'):
+        return None
+    return getattr(evalua, 'minimo', 0)
+
+
+def evalua_hojas(juego, estado, jugadas, jugador, evalua, contexto=None):
+    """
+    Valores (para jugador) de los estados que resultan de cada jugada,
+    como los calcularía negamax con d=0, pero evaluando todos los que no
+    son terminales con una sola llamada a evalua.lote
+
+    """
+    hijos = [juego.transicion(estado, a, jugador) for a in jugadas]
+    if contexto != None:
+        contexto.nodos += len(hijos)
+        if contexto.limite != None and time() > contexto.limite:
+            raise TiempoAgotado()
+    valores = [
+        jugador * juego.ganancia(hijo) if juego.terminal(hijo) else None
+        for hijo in hijos
+    ]
+    pendientes = [hijo for hijo, v in zip(hijos, valores) if v is None]
+    if pendientes:
+        evaluados = iter(evalua.lote(pendientes))
+        valores = [
+            jugador * next(evaluados) if v is None else v for v in valores
+        ]
+    return valores
+
+
+class EvaluacionPorLotes:
+    """
+    Función de evaluación que además puede evaluar muchos estados a la vez
+
+    Se llama como la función original, evaluacion(s), y tiene el método
+    lote(estados) que negamax usa en los nodos de profundidad 1. La
+    evaluación por lotes recibe un arreglo con un estado por renglón
+    (por ejemplo, uno de NumPy de (N, 42)) que se construye con
+    a_arreglo(estados), y devuelve los N valores.
+
+    Es experimental: al evaluar todos los hijos antes de recorrerlos se
+    pierden los cortes beta entre las hojas, así que se evalúan más
+    nodos, y armar el arreglo cuesta más que lo que ahorra con pocos
+    hijos (en el banco de pruebas, estrategico/lotes de UltimateTicTacToe
+    con minimo=0 tarda varias veces más que estrategico/avanzada, y
+    centro/lotes de Conecta4 más que centro/incremental). Por eso solo
+    se usa en los nodos con al menos minimo jugadas; en los demás se
+    evalúa estado por estado como con la función original.
+
+    """
+    def __init__(self, evalua, evalua_arreglo, a_arreglo,
+                 minimo=MINIMO_LOTE):
+        """
+        evalua (function): evaluación de un estado, evalua(s)
+        evalua_arreglo (function): evaluación de un arreglo de estados
+        a_arreglo (function): convierte una lista de estados al arreglo
+            que recibe evalua_arreglo
+        minimo (int): número de jugadas a partir del cual se evalúa por
+            lotes (0 para hacerlo siempre)
+
+        """
+        self.evalua = evalua
+        self.evalua_arreglo = evalua_arreglo
+        self.a_arreglo = a_arreglo
+        self.minimo = minimo
+
+    def __call__(self, s):
+        return self.evalua(s)
+
+    def lote(self, estados):
+        """Lista con la evaluación de cada estado"""
+        return self.evalua_arreglo(self.a_arreglo(estados)).tolist()
+
+
+@lru_cache(maxsize=None)
+def recibe_estado(ordena):
+    """
+    True si la función de ordenamiento recibe (juego, estado, jugadas,
+    jugador), False si solo recibe (jugadas, jugador)
+
+    """
+    return len(signature(ordena).parameters) >= 4
+
+
+def ordena_jugadas(ordena, juego, estado, jugadas, jugador):
+    """Aplica la función de ordenamiento con la firma que le corresponda"""
+    if recibe_estado(ordena):
+        return ordena(juego, estado, jugadas, jugador)
+    return ordena(jugadas, jugador)
+
+
+class TiempoAgotado(Exception):
+    """Se lanza desde negamax cuando se pasa el límite de tiempo"""
+
+
+class ContextoBusqueda:
+    """
+    Lo que se conserva de una búsqueda a otra durante todo un juego
+
+    Se crea uno por jugador y se pasa a jugador_negamax o a
+    minimax_iterativo en cada jugada, de forma que la tabla de
+    transposición se reutiliza entre las iteraciones de la búsqueda
+    iterativa y entre jugadas sucesivas.
+
+    También lleva el límite de tiempo de la búsqueda en curso, y lo que
+    la búsqueda aprende para ordenar las jugadas:
+
+        - Jugadas asesinas: por cada ply, las dos últimas jugadas que
+          provocaron un corte beta
+        - Heurística de historia: por cada jugada, la suma de d**2 de
+          los cortes beta que ha provocado
+
+    Después de aplicar la función de ordenamiento del usuario, las
+    jugadas se reordenan (de forma estable) por su historia y las
+    asesinas del ply se ponen al frente.
+
+    Opcionalmente lleva las estadísticas de las búsquedas.
+
+    identidad y busquedas (el número de llamadas a nueva_busqueda)
+    identifican la búsqueda en curso, para que los procesos auxiliares
+    de paralelo lleven su propio contexto por cada contexto de aquí.
+
+    """
+    def __init__(self, capacidad=1 << 18, esquema='dos_niveles',
+                 envejece=True, revisa_cada=64,
+                 asesinas=True, historia=True, transp=None,
+                 estadisticas=None):
+        """
+        capacidad (int): número de cubetas de la tabla de transposición
+        esquema (str): esquema de reemplazo de la tabla
+        envejece (bool): si True, las entradas de jugadas anteriores
+            se reemplazan primero
+        revisa_cada (int): cada cuántos nodos se revisa el reloj
+        asesinas (bool): usar jugadas asesinas
+        historia (bool): usar la heurística de historia
+        transp (TablaTransposicion): tabla a usar (por ejemplo, una
+            TablaCompartida). Si None, se crea una con la capacidad y
+            el esquema dados
+        estadisticas (EstadisticasBusqueda): si no es None, las
+            búsquedas con este contexto la llenan
+
+        """
+        self.transp = (
+            TablaTransposicion(capacidad, esquema) if transp is None
+            else transp
+        )
+        self.envejece = envejece
+        self.revisa_cada = revisa_cada
+        self.limite = None
+        self.nodos = 0
+        self.parcial = None
+        self.asesinas = {} if asesinas else None
+        self.historia = {} if historia else None
+        self.estadisticas = estadisticas
+        self.identidad = uuid4().hex
+        self.busquedas = 0
+
+    def ordena_jugadas(self, jugadas, ply):
+        """Reordena las jugadas según la historia y las jugadas asesinas"""
+        if self.estadisticas is not None:
+            self.estadisticas.expande(ply, len(jugadas))
+        if self.historia:
+            historia = self.historia
+            jugadas = sorted(jugadas, key=lambda a: -historia.get(a, 0))
+        if self.asesinas:
+            asesinas = [a for a in self.asesinas.get(ply, ()) if a in jugadas]
+            if asesinas:
+                jugadas = asesinas + [a for a in jugadas if a not in asesinas]
+        return jugadas
+
+    def registra_corte(self, a, ply, d):
+        """Registra que la jugada a provocó un corte beta en el ply"""
+        if self.estadisticas is not None:
+            self.estadisticas.corte(ply)
+        if self.asesinas is not None:
+            asesinas = self.asesinas.setdefault(ply, [])
+            if a not in asesinas:
+                asesinas.insert(0, a)
+                del asesinas[2:]
+        if self.historia is not None:
+            self.historia[a] = self.historia.get(a, 0) + (d * d if d else 1)
+
+    def nueva_busqueda(self, limite=None):
+        """
+        Se llama al comenzar la búsqueda de cada jugada
+
+        limite (float): tiempo (según time()) en el que se debe
+            abortar la búsqueda, o None para no limitarla
+
+        """
+        if self.envejece:
+            self.transp.envejece()
+        if self.asesinas is not None:
+            self.asesinas.clear()
+        if self.historia is not None:
+            self.historia = {a: h // 2 for a, h in self.historia.items()}
+        self.limite = limite
+        self.nodos = 0
+        self.parcial = None
+        self.busquedas += 1
+        if self.estadisticas is not None:
+            self.estadisticas.nueva_busqueda()
+
+
+class EstadisticasBusqueda:
+    """
+    Estadísticas de las búsquedas de negamax, para afinar los parámetros
+    con datos
+
+    Se activan pasando una al ContextoBusqueda. Mientras la búsqueda
+    corre se cuenta, por ply, cuántos nodos se expandieron, cuántas
+    jugadas legales tenían y cuántos cortes beta hubo; las consultas,
+    aciertos y escrituras de la tabla de transposición; las
+    evaluaciones, y el tiempo que se va en evalua, en ordena y en
+    transicion (incluyendo hacer y deshacer).
+
+    Cada búsqueda de jugador_negamax y cada iteración de
+    minimax_iterativo deja un registro (dict, ver registra) en registros,
+    y si se da un archivo, también una línea JSON al final del archivo.
+    Después de cada registro los contadores vuelven a cero.
+
+    Medir tiene su costo: la búsqueda es más lenta con estadísticas, y
+    los tiempos incluyen la sobrecarga de medirlos.
+
+    """
+    def __init__(self, archivo=None):
+        """
+        archivo (str): archivo donde se agregan los registros como
+            líneas JSON, o None para solo guardarlos en registros
+
+        """
+        self.archivo = archivo
+        self.registros = []
+        self.busqueda = 0
+        self._ordena = {}
+        self.reinicia()
+
+    def reinicia(self):
+        """Pone los contadores en cero"""
+        self.expandidos = {}
+        self.jugadas = {}
+        self.cortes = {}
+        self.consultas_tt = self.aciertos_tt = self.escrituras_tt = 0
+        self.evaluaciones = 0
+        self.segundos = {'evalua': 0.0, 'ordena': 0.0, 'transicion': 0.0}
+
+    def nueva_busqueda(self):
+        """Se llama al comenzar la búsqueda de cada jugada"""
+        self.busqueda += 1
+        self.reinicia()
+
+    def expande(self, ply, n):
+        """Registra un nodo expandido en el ply con n jugadas legales"""
+        self.expandidos[ply] = self.expandidos.get(ply, 0) + 1
+        self.jugadas[ply] = self.jugadas.get(ply, 0) + n
+
+    def corte(self, ply):
+        """Registra un corte beta en el ply"""
+        self.cortes[ply] = self.cortes.get(ply, 0) + 1
+
+    def instrumenta(self, juego, ordena, evalua, transp):
+        """
+        Envuelve el juego, las funciones y la tabla de una búsqueda para
+        que cuenten y midan sobre estas estadísticas
+
+        """
+        juego = _JuegoMedido(juego, self)
+        if ordena is not None:
+            if ordena not in self._ordena:
+                self._ordena[ordena] = _OrdenaMedida(ordena, juego.juego, self)
+            ordena = self._ordena[ordena]
+        if evalua is not None:
+            evalua = _evaluacion_medida(evalua, self)
+        return juego, ordena, evalua, _TablaContada(transp, self)
+
+    def resumen(self):
+        """
+        Las estadísticas acumuladas desde el último registro
+
+        Regresa
+        -------
+        dict: listas por ply (desde la raíz) de nodos expandidos, factor
+            de ramificación (jugadas legales por nodo expandido) y tasa
+            de cortes beta por nodo expandido; consultas, aciertos y
+            escrituras de la tabla de transposición y la tasa de
+            aciertos; evaluaciones, y tiempos: segundos en evalua,
+            ordena y transicion
+
+        """
+        plies = range(max(self.expandidos, default=-1) + 1)
+        expandidos = [self.expandidos.get(p, 0) for p in plies]
+        return {
+            'expandidos': expandidos,
+            'ramificacion': [
+                self.jugadas.get(p, 0) / n if n else 0.0
+                for p, n in zip(plies, expandidos)
+            ],
+            'tasa_cortes': [
+                self.cortes.get(p, 0) / n if n else 0.0
+                for p, n in zip(plies, expandidos)
+            ],
+            'consultas_tt': self.consultas_tt,
+            'aciertos_tt': self.aciertos_tt,
+            'escrituras_tt': self.escrituras_tt,
+            'tasa_aciertos_tt': (
+                self.aciertos_tt / self.consultas_tt
+                if self.consultas_tt else 0.0
+            ),
+            'evaluaciones': self.evaluaciones,
+            'tiempos': dict(self.segundos),
+        }
+
+    def registra(self, **datos):
+        """
+        Guarda un registro con los datos dados (profundidad, valor,
+        traza, nodos, segundos...) y el resumen, y reinicia los
+        contadores
+
+        Regresa
+        -------
+        dict: el registro
+
+        """
+        registro = {'busqueda': self.busqueda, **datos, **self.resumen()}
+        self.registros.append(registro)
+        if self.archivo is not None:
+            with open(self.archivo, 'a') as f:
+                f.write(dumps(registro) + '\n')
+        self.reinicia()
+        return registro
+
+
+class _JuegoMedido:
+    """
+    Envoltura del juego que mide el tiempo de transicion, hacer y
+    deshacer (el resto se delega al juego)
+
+    """
+    def __init__(self, juego, estadisticas):
+        self.juego = juego
+        self.estadisticas = estadisticas
+        for nombre in ('transicion', 'hacer', 'deshacer'):
+            if hasattr(juego, nombre):
+                setattr(self, nombre, self._mide(getattr(juego, nombre)))
+
+    def __getattr__(self, nombre):
+        if nombre == 'juego':
+            raise AttributeError(nombre)
+        return getattr(self.juego, nombre)
+
+    def _mide(self, funcion):
+        segundos = self.estadisticas.segundos
+
+        def medida(*args):
+            inicio = perf_counter()
+            resultado = funcion(*args)
+            segundos['transicion'] += perf_counter() - inicio
+            return resultado
+        return medida
+
+
+class _OrdenaMedida:
+    """
+    Función de ordenamiento que mide su tiempo. Recibe siempre el estado,
+    y le pasa a la original el juego sin envolver, para que sus llamadas
+    a transicion no se cuenten dos veces
+
+    """
+    def __init__(self, ordena, juego, estadisticas):
+        self.ordena = ordena
+        self.juego = juego
+        self.estadisticas = estadisticas
+
+    def __call__(self, juego, estado, jugadas, jugador):
+        inicio = perf_counter()
+        jugadas = ordena_jugadas(
+            self.ordena, self.juego, estado, jugadas, jugador
+        )
+        self.estadisticas.segundos['ordena'] += perf_counter() - inicio
+        return jugadas
+
+
+def _evaluacion_medida(evalua, estadisticas):
+    """Función de evaluación que cuenta y mide (conserva lote si lo hay)"""
+    def medida(s):
+        inicio = perf_counter()
+        v = evalua(s)
+        estadisticas.segundos['evalua'] += perf_counter() - inicio
+        estadisticas.evaluaciones += 1
+        return v
+
+    if hasattr(evalua, 'lote'):
+        def lote(estados):
+            inicio = perf_counter()
+            valores = evalua.lote(estados)
+            estadisticas.segundos['evalua'] += perf_counter() - inicio
+            estadisticas.evaluaciones += len(estados)
+            return valores
+        medida.lote = lote
+        medida.minimo = getattr(evalua, 'minimo', 0)
+    return medida
+
+
+class _TablaContada(TablaTransposicion):
+    """Envoltura de la tabla de transposición que cuenta los accesos"""
+    def __init__(self, tabla, estadisticas):
+        self.tabla = tabla
+        self.estadisticas = estadisticas
+
+    def get(self, clave, defecto=None):
+        self.estadisticas.consultas_tt += 1
+        entrada = self.tabla.get(clave)
+        if entrada is None:
+            return defecto
+        self.estadisticas.aciertos_tt += 1
+        return entrada
+
+    def __setitem__(self, clave, entrada):
+        self.estadisticas.escrituras_tt += 1
+        self.tabla[clave] = entrada
+
+    def __len__(self):
+        return len(self.tabla)
+
+
+def _llamada_vacia(
+    juego, estado, jugador, alpha, beta, ordena, d, evalua,
+    transp, traza, clave, contexto, ply, pvs, zobrist, mutable, lote
+    ):
+    """Función con los mismos argumentos que _negamax, que no hace nada"""
+
+
+def mide_sobrecarga(juego, estado, jugador, d=None, evalua=None, ordena=None,
+                    pvs=False, repeticiones=100000):
+    """
+    Mide qué parte del tiempo por nodo de negamax se va en el manejo de
+    los argumentos: el tiempo por nodo de una búsqueda, el de revisar
+    los parámetros (que negamax hace una sola vez por búsqueda) y el de
+    una llamada vacía con los 17 argumentos del núcleo recursivo (que se
+    paga en cada nodo)
+
+    Regresa
+    -------
+    dict: nodos, segundos, y microsegundos por nodo, por revisión de
+        parámetros y por llamada
+
+    """
+    contexto = ContextoBusqueda()
+    inicio = perf_counter()
+    negamax(
+        juego, estado, jugador, ordena=ordena, d=d, evalua=evalua,
+        transp=contexto.transp, traza=[], contexto=contexto, pvs=pvs
+    )
+    tiempo = perf_counter() - inicio
+    argumentos = (
+        juego, estado, jugador, -1e10, 1e10, ordena, d, evalua,
+        contexto.transp, [], None, contexto, 0, pvs,
+        hasattr(juego, 'zobrist'),
+        hasattr(juego, 'zobrist') and hasattr(juego, 'hacer'),
+        minimo_lote(evalua)
+    )
+    inicio = perf_counter()
+    for _ in range(repeticiones):
+        valida_parametros(ordena, d, evalua, contexto.transp, [], contexto)
+    validacion = perf_counter() - inicio
+    inicio = perf_counter()
+    for _ in range(repeticiones):
+        _llamada_vacia(*argumentos)
+    llamada = perf_counter() - inicio
+    medidas = {
+        'nodos': contexto.nodos,
+        'segundos': tiempo,
+        'us_por_nodo': 1e6 * tiempo / contexto.nodos,
+        'us_por_validacion': 1e6 * validacion / repeticiones,
+        'us_por_llamada': 1e6 * llamada / repeticiones,
+    }
+    print(f"{medidas['nodos']} nodos en {tiempo:.3f} s, "
+          f"{medidas['us_por_nodo']:.2f} µs/nodo")
+    for nombre, clave in (("revisión de parámetros", 'us_por_validacion'),
+                          ("llamada con argumentos", 'us_por_llamada')):
+        print(f"{nombre:>24}: {medidas[clave]:.3f} µs "
+              f"({100 * medidas[clave] / medidas['us_por_nodo']:.1f}% de un nodo)")
+    return medidas
+
+
 def jugador_negamax(
-    juego, estado, jugador, ordena=None, d=None, evalua=None
+    juego, estado, jugador, ordena=None, d=None, evalua=None,
+    contexto=None, pvs=False, finales=None
     ):
     """
     Funcion burrito para el negamax
+
+    Si no se da un contexto, la tabla de transposición se usa
+    solo para esta jugada
+
+    finales: si no es None, objeto con el método consulta(juego, estado,
+        jugador) que da la jugada perfecta o None (ver el módulo
+        finales); si la da, no se busca
+
+    Si el contexto tiene estadisticas, la búsqueda deja un registro.
     
     """
-    traza, _ = negamax(
+    if finales is not None:
+        a = finales.consulta(juego, estado, jugador)
+        if a is not None:
+            return a
+    if contexto is None:
+        contexto = ContextoBusqueda()
+    contexto.nueva_busqueda()
+    inicio = perf_counter()
+    traza, v = negamax(
         juego=juego, estado=estado, jugador=jugador, 
         alpha=-1e10, beta=1e10, ordena=ordena, d=d, 
-        evalua=evalua, transp={}, traza=[])
+        evalua=evalua, transp=contexto.transp, traza=[],
+        contexto=contexto, pvs=pvs)
+    if contexto.estadisticas is not None:
+        _registra_busqueda(
+            contexto, d, v, traza, contexto.nodos, perf_counter() - inicio
+        )
     return traza[0]
 
 
+def _registra_busqueda(contexto, d, v, traza, nodos, segundos, **datos):
+    """Registro de una búsqueda (o iteración) en las estadísticas"""
+    return contexto.estadisticas.registra(
+        d=d, valor=v, traza=traza, nodos=nodos, segundos=segundos,
+        nps=nodos / segundos if segundos else 0.0, **datos
+    )
+
+
 def minimax_iterativo(
     juego, estado, jugador, tiempo=10,
-    ordena=None, d=None, evalua=None,
+    ordena=None, d=None, evalua=None, contexto=None,
+    pvs=False, aspiracion=None, finales=None
     ):  
     """
     Devuelve la mejor jugada para el jugador en el estado
     acotando a un periodo de tiempo
+
+    Todas las iteraciones comparten la tabla de transposición del
+    contexto (o una nueva si contexto es None)
+
+    La búsqueda se aborta en cuanto se pasa el tiempo, y se usa la
+    mejor jugada de la última iteración, o de la iteración abortada si
+    alcanzó a encontrar una (la jugada de la iteración anterior se busca
+    primero, así que cualquier jugada encontrada es al menos tan buena)
+
+    pvs (bool): usar búsqueda de variante principal en el negamax
+    aspiracion (float): si no es None, cada iteración busca primero con
+        la ventana (v - aspiracion, v + aspiracion) alrededor del valor v
+        de la iteración anterior, y repite con la ventana completa si el
+        valor cae fuera de ella
+    finales: como en jugador_negamax
+
+    Si el contexto tiene estadisticas, cada iteración deja un registro
+    con completa=True, y la que se aborta con completa=False. En cada
+    uno, ramificacion_efectiva es el cociente de sus nodos entre los de
+    la iteración anterior, y re_busqueda indica si la ventana de
+    aspiración falló
     
     """
+    if finales is not None:
+        a = finales.consulta(juego, estado, jugador)
+        if a is not None:
+            return a
     t0 = time()
-    d, traza = 2, []
-    while time() - t0 < tiempo/2:
-        traza, v = negamax(
-            juego=juego, estado=estado, jugador=jugador,  
-            alpha=-1e10, beta=1e10, ordena=ordena, d=d, evalua=evalua, 
-            transp={}, traza=traza
-        )
-        d += 1
+    if contexto is None:
+        contexto = ContextoBusqueda()
+    contexto.nueva_busqueda(limite=t0 + tiempo)
+    d, traza, v = 2, [], None
+    estadisticas = contexto.estadisticas
+    nodos, re_busqueda = 0, False
+    try:
+        while time() - t0 < tiempo/2:
+            if estadisticas is not None:
+                inicio, nodos_antes = perf_counter(), contexto.nodos
+                re_busqueda = False
+            contexto.parcial = None
+            alpha, beta = -1e10, 1e10
+            if aspiracion != None and v != None:
+                alpha, beta = v - aspiracion, v + aspiracion
+            traza_nueva, v_nuevo = negamax(
+                juego=juego, estado=estado, jugador=jugador,  
+                alpha=alpha, beta=beta, ordena=ordena, d=d, evalua=evalua, 
+                transp=contexto.transp, traza=traza[:], contexto=contexto,
+                pvs=pvs
+            )
+            if v_nuevo <= alpha or v_nuevo >= beta:
+                re_busqueda = True
+                traza_nueva, v_nuevo = negamax(
+                    juego=juego, estado=estado, jugador=jugador,  
+                    alpha=-1e10, beta=1e10, ordena=ordena, d=d,
+                    evalua=evalua, transp=contexto.transp, traza=traza[:],
+                    contexto=contexto, pvs=pvs
+                )
+            traza, v = traza_nueva, v_nuevo
+            if estadisticas is not None:
+                nodos = _registra_iteracion(
+                    contexto, d, v, traza, nodos_antes, inicio, nodos,
+                    re_busqueda, True
+                )
+            d += 1
+    except TiempoAgotado:
+        if contexto.parcial:
+            traza = contexto.parcial
+        if estadisticas is not None:
+            _registra_iteracion(
+                contexto, d, None, contexto.parcial, nodos_antes, inicio,
+                nodos, re_busqueda, False
+            )
+    finally:
+        contexto.limite = None
+    if not traza:
+        jugadas = list(juego.jugadas_legales(estado, jugador))
+        if ordena != None:
+            jugadas = ordena_jugadas(ordena, juego, estado, jugadas, jugador)
+        traza = jugadas
     return traza[0]
+
+
+def _registra_iteracion(contexto, d, v, traza, nodos_antes, inicio,
+                        nodos_anterior, re_busqueda, completa):
+    """
+    Registra una iteración de minimax_iterativo en las estadísticas
+
+    Regresa
+    -------
+    int: nodos de la iteración
+
+    """
+    nodos = contexto.nodos - nodos_antes
+    _registra_busqueda(
+        contexto, d, v, traza, nodos, perf_counter() - inicio,
+        completa=completa, re_busqueda=re_busqueda,
+        ramificacion_efectiva=(
+            nodos / nodos_anterior if nodos_anterior else None
+        )
+    )
+    return nodos
@@ -0,0 +1,287 @@
+"""
+Modulo experimental con el negamax sin recursión (pila explícita)
+
+No es más rápido por nodo que el negamax recursivo de minimax (en
+CPython 3.11 las llamadas entre funciones de Python ya son baratas; con
+la tupla de Conecta4 es incluso más lento), y su única ventaja es no
+depender del límite de recursión. Como es una segunda copia del núcleo
+de minimax.negamax, cualquier cambio a la búsqueda hay que hacerlo en
+los dos, y verifica_nucleos revisa que sigan recorriendo el mismo árbol:
+
+    python minimax_pila.py
+
+"""
+from random import shuffle
+from time import perf_counter, time
+
+from minimax import negamax, valida_parametros, ordena_jugadas, evalua_hojas
+from minimax import minimo_lote, ContextoBusqueda, TiempoAgotado
+from minimax import VENTANA_NULA
+from transposicion import EXACTO, INFERIOR, SUPERIOR
+
+class _Nodo:
+    """Nodo abierto de negamax_pila: las variables locales de negamax"""
+    __slots__ = (
+        'estado', 'jugador', 'alpha', 'beta', 'd', 'clave', 'ply',
+        'd_hijo', 'alpha_0', 'jugadas', 'hojas', 'i', 'v', 'mejor',
+        'mejores', 'hijo', 'clave_hijo', 'nula'
+    )
+
+
+def negamax_pila(
+    juego, estado, jugador,
+    alpha=-1e10, beta=1e10, ordena=None,
+    d=None, evalua=None,
+    transp={}, traza=[], clave=None,
+    contexto=None, pvs=False
+    ):
+    """
+    Igual que negamax (mismos parámetros y mismo resultado), pero sin
+    recursión: los nodos abiertos se guardan en una pila explícita
+
+    Así no se crea un marco de Python con sus argumentos por cada nodo,
+    y la búsqueda hasta el final (d=None) no depende del límite de
+    recursión.
+
+    """
+    valida_parametros(ordena, d, evalua, transp, traza, contexto)
+    if contexto != None and contexto.estadisticas != None:
+        juego, ordena, evalua, transp = contexto.estadisticas.instrumenta(
+            juego, ordena, evalua, transp
+        )
+    zobrist = hasattr(juego, 'zobrist')
+    mutable = zobrist and hasattr(juego, 'hacer')
+    lote = minimo_lote(evalua)
+    terminal, ganancia, transicion = juego.terminal, juego.ganancia, juego.transicion
+
+    def hoja(estado, jugador, d):
+        """
+        Lo primero que hace negamax en cada nodo: cuenta el nodo y
+        regresa (traza, valor) si es terminal o de profundidad 0, o None
+
+        """
+        if contexto != None:
+            contexto.nodos += 1
+            if (contexto.limite != None and
+                    contexto.nodos % contexto.revisa_cada == 0 and
+                    time() > contexto.limite):
+                raise TiempoAgotado()
+        if terminal(estado):
+            return [], jugador * ganancia(estado)
+        if d == 0:
+            return [], jugador * evalua(estado)
+        return None
+
+    def expande(estado, jugador, alpha, beta, d, clave, ply):
+        """
+        Lo que hace negamax antes de recorrer las jugadas: regresa
+        (traza, valor) si el nodo se resuelve con la tabla de
+        transposición, o el _Nodo a expandir
+
+        """
+        if clave is None:
+            clave = juego.zobrist(estado) if zobrist else estado
+        entrada = transp.get(clave)
+        a_tt = None
+        if entrada is not None:
+            v_tt, d_tt, cota, a_tt = entrada
+            if d_tt is None or (d is not None and d_tt >= d):
+                if cota == INFERIOR:
+                    alpha = max(alpha, v_tt)
+                elif cota == SUPERIOR:
+                    beta = min(beta, v_tt)
+                if cota == EXACTO or alpha >= beta:
+                    traza.clear()
+                    return [a_tt], v_tt
+        jugadas = list(juego.jugadas_legales(estado, jugador))
+        if ordena != None:
+            jugadas = ordena_jugadas(ordena, juego, estado, jugadas, jugador)
+        else:
+            shuffle(jugadas)
+        if contexto != None:
+            jugadas = contexto.ordena_jugadas(jugadas, ply)
+        if a_tt in jugadas:
+            jugadas = [a_tt] + [a for a in jugadas if a != a_tt]
+        if traza:
+            a_pref = traza.pop(0)
+            if a_pref in jugadas:
+                jugadas = [a_pref] + [a for a in jugadas if a != a_pref]
+        nodo = _Nodo()
+        nodo.estado, nodo.jugador, nodo.clave = estado, jugador, clave
+        nodo.d, nodo.d_hijo = d, d if d == None else d - 1
+        nodo.alpha = nodo.alpha_0 = alpha
+        nodo.beta, nodo.ply, nodo.jugadas = beta, ply, jugadas
+        nodo.hojas = (
+            evalua_hojas(juego, estado, jugadas, jugador, evalua, contexto)
+            if d == 1 and lote is not None and len(jugadas) >= lote
+            else None
+        )
+        nodo.i, nodo.v, nodo.nula = 0, -1e10, False
+        return nodo
+
+    if mutable:
+        estado = juego.mutable(estado)
+    resultado = hoja(estado, jugador, d) or expande(
+        estado, jugador, alpha, beta, d, clave, 0
+    )
+    if type(resultado) == tuple:
+        return resultado
+    pila, resultado = [resultado], None
+    while True:
+        nodo = pila[-1]
+        a = nodo.jugadas[nodo.i]
+        if resultado is None:
+            # Se abre el hijo de la jugada nodo.i
+            if nodo.hojas is not None:
+                resultado = [], -nodo.hojas[nodo.i]
+            else:
+                if mutable:
+                    nodo.clave_hijo = juego.zobrist_transicion(
+                        nodo.clave, nodo.estado, a, nodo.jugador, None
+                    )
+                    juego.hacer(nodo.estado, a, nodo.jugador)
+                    nodo.hijo = nodo.estado
+                else:
+                    nodo.hijo = transicion(nodo.estado, a, nodo.jugador)
+                    nodo.clave_hijo = (
+                        juego.zobrist_transicion(
+                            nodo.clave, nodo.estado, a, nodo.jugador, nodo.hijo
+                        ) if zobrist else None
+                    )
+                nodo.nula = pvs and nodo.i > 0
+                alpha_hijo = (
+                    -nodo.alpha - VENTANA_NULA if nodo.nula else -nodo.beta
+                )
+        elif nodo.nula:
+            nodo.nula = False
+            if nodo.alpha < -resultado[1] < nodo.beta:
+                # Se vuelve a buscar el hijo con la ventana completa
+                resultado, alpha_hijo = None, -nodo.beta
+        if resultado is None:
+            resultado = hoja(nodo.hijo, -nodo.jugador, nodo.d_hijo) or expande(
+                nodo.hijo, -nodo.jugador, alpha_hijo, -nodo.alpha,
+                nodo.d_hijo, nodo.clave_hijo, nodo.ply + 1
+            )
+            if type(resultado) != tuple:
+                pila.append(resultado)
+                resultado = None
+            continue
+        # Resultado del hijo de la jugada nodo.i
+        traza_actual, v2 = resultado
+        v2 = -v2
+        resultado = None
+        if mutable and nodo.hojas is None:
+            juego.deshacer(nodo.estado, a, nodo.jugador)
+        if v2 > nodo.v:
+            nodo.v = v2
+            nodo.mejor = a
+            nodo.mejores = traza_actual[:]
+            if nodo.ply == 0 and contexto != None and v2 > nodo.alpha:
+                contexto.parcial = [nodo.mejor] + nodo.mejores
+        nodo.i += 1
+        if nodo.v >= nodo.beta:
+            if contexto != None:
+                contexto.registra_corte(a, nodo.ply, nodo.d)
+        else:
+            if nodo.v > nodo.alpha:
+                nodo.alpha = nodo.v
+            if nodo.i < len(nodo.jugadas):
+                continue
+        # Se cierra el nodo
+        v = nodo.v
+        if v <= nodo.alpha_0:
+            cota = SUPERIOR
+        elif v >= nodo.beta:
+            cota = INFERIOR
+        else:
+            cota = EXACTO
+        transp[nodo.clave] = (v, nodo.d, cota, nodo.mejor)
+        resultado = [nodo.mejor] + nodo.mejores, v
+        pila.pop()
+        if not pila:
+            return resultado
+
+
+def mide_negamax(juego, estado, jugador, d=None, evalua=None, ordena=None,
+                 pvs=False, busquedas=(negamax, negamax_pila)):
+    """
+    Compara el tiempo por nodo de varias implementaciones del negamax
+    buscando desde el mismo estado, cada una con una tabla de
+    transposición nueva (ordena no debe ser aleatorio para que recorran
+    el mismo árbol)
+
+    Regresa
+    -------
+    list: (nombre, nodos, segundos, microsegundos por nodo) por búsqueda
+
+    """
+    resultados = []
+    for busqueda in busquedas:
+        contexto = ContextoBusqueda()
+        inicio = perf_counter()
+        busqueda(
+            juego, estado, jugador, ordena=ordena, d=d, evalua=evalua,
+            transp=contexto.transp, traza=[], contexto=contexto, pvs=pvs
+        )
+        tiempo = perf_counter() - inicio
+        resultados.append((
+            busqueda.__name__, contexto.nodos, tiempo,
+            1e6 * tiempo / contexto.nodos
+        ))
+        print(
+            f"{busqueda.__name__:>16}: {contexto.nodos:9d} nodos, "
+            f"{tiempo:7.3f} s, {resultados[-1][3]:6.2f} µs/nodo"
+        )
+    return resultados
+
+
+def verifica_nucleos(d=3, posiciones=4, imprime=True):
+    """
+    Revisa que negamax y negamax_pila den la misma traza, el mismo valor
+    y los mismos nodos en las primeras posiciones del banco de pruebas
+    de cada juego, con cada configuración de rendimiento.CONFIGURACIONES,
+    con y sin búsqueda de variante principal (las configuraciones sin
+    evaluación buscan hasta el final)
+
+    Regresa
+    -------
+    list: (juego, configuracion, posicion, pvs) de cada diferencia
+
+    """
+    from rendimiento import CONFIGURACIONES, carga_posiciones, reproduce
+
+    diferencias = []
+    for nombre, (clase, _, configuraciones) in CONFIGURACIONES.items():
+        juego = clase()
+        for posicion in carga_posiciones(nombre)[:posiciones]:
+            s, j = reproduce(juego, posicion['jugadas'])
+            for configuracion, ordena, evalua in configuraciones:
+                for pvs in (False, True):
+                    resultados = []
+                    for busqueda in (negamax, negamax_pila):
+                        contexto = ContextoBusqueda()
+                        traza, v = busqueda(
+                            juego, s, j, ordena=ordena,
+                            d=d if evalua is not None else None,
+                            evalua=evalua, transp=contexto.transp, traza=[],
+                            contexto=contexto, pvs=pvs
+                        )
+                        resultados.append((traza, v, contexto.nodos))
+                    if resultados[0] != resultados[1]:
+                        diferencias.append(
+                            (nombre, configuracion, posicion['nombre'], pvs)
+                        )
+                        if imprime:
+                            print(f"{nombre} {configuracion} "
+                                  f"{posicion['nombre']} pvs={pvs}: "
+                                  f"{resultados[0]} != {resultados[1]}")
+    return diferencias
+
+
+if __name__ == '__main__':
+    import sys
+
+    diferencias = verifica_nucleos()
+    if not diferencias:
+        print("negamax y negamax_pila recorren el mismo árbol")
+    sys.exit(1 if diferencias else 0)
@@ -0,0 +1,456 @@
+"""
+Modulo con la búsqueda negamax y MCTS en paralelo sobre varios procesos
+
+    1- Búsqueda en paralelo de las jugadas de la raíz (Young Brothers Wait)
+    2- Lazy SMP: varios procesos hacen la búsqueda iterativa sobre la misma
+       raíz compartiendo una tabla de transposición en memoria compartida
+    3- MCTS con paralelismo de raíz: un árbol independiente por proceso,
+       y se suman las visitas de las jugadas de la raíz
+    4- MCTS con paralelismo de árbol: un solo árbol en este proceso, con
+       pérdida virtual, y las simulaciones de lotes de hojas en los demás
+
+Las funciones de ordenamiento y de evaluación se envían a otros procesos,
+así que tienen que poder serializarse con pickle (funciones definidas a
+nivel de módulo, no lambdas).
+
+"""
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from os import cpu_count
+from random import seed
+from time import time
+
+from minimax import negamax, ordena_jugadas, ContextoBusqueda, TiempoAgotado
+from transposicion import TablaCompartida
+from mcts import ArbolMCTS, C_UCT, selecciona_hoja, retropropaga, simulacion
+
+# Contextos de búsqueda de cada proceso trabajador, uno por cada contexto
+# del proceso principal (por su identidad): identidad -> [busquedas,
+# ContextoBusqueda]. Se conservan entre tareas, solo los de los últimos
+# CONTEXTOS_PROCESO contextos usados (uno por jugador de una partida)
+_contextos_proceso = OrderedDict()
+CONTEXTOS_PROCESO = 2
+# Árbol MCTS de cada proceso trabajador, se conserva entre tareas
+_arbol_proceso = None
+# Si ya se inicializó el generador aleatorio del proceso trabajador
+_sembrado = False
+
+def _contexto_trabajador(identidad, busquedas):
+    """
+    Contexto del proceso trabajador que corresponde al contexto identidad
+    del proceso principal, con nueva_busqueda la primera vez que llega
+    una tarea de cada búsqueda. Si busquedas retrocede (el contexto del
+    principal se reemplazó o se copió) el contexto se crea de nuevo, y se
+    descartan los menos recientes si hay más de CONTEXTOS_PROCESO
+
+    """
+    entrada = _contextos_proceso.get(identidad)
+    if entrada is None or (entrada[0] is not None and busquedas < entrada[0]):
+        entrada = _contextos_proceso[identidad] = [None, ContextoBusqueda()]
+    _contextos_proceso.move_to_end(identidad)
+    while len(_contextos_proceso) > CONTEXTOS_PROCESO:
+        _contextos_proceso.popitem(last=False)
+    if entrada[0] != busquedas:
+        entrada[0] = busquedas
+        entrada[1].nueva_busqueda()
+    return entrada[1]
+
+
+def _busca_hijo(juego, estado, jugador, alpha, ordena, d, evalua, pvs,
+                contexto):
+    """
+    Busca el estado que resulta de una jugada de la raíz con la ventana
+    (-1e10, -alpha) y devuelve su valor desde el punto de vista de jugador
+
+    contexto (ContextoBusqueda o tuple): el contexto, o en un proceso
+        trabajador (identidad, busquedas) del contexto del principal
+
+    """
+    if type(contexto) == tuple:
+        contexto = _contexto_trabajador(*contexto)
+    _, v = negamax(
+        juego=juego, estado=estado, jugador=-jugador,
+        alpha=-1e10, beta=-alpha, ordena=ordena, d=d, evalua=evalua,
+        transp=contexto.transp, traza=[], contexto=contexto, pvs=pvs
+    )
+    return -v
+
+
+def jugador_negamax_paralelo(
+    juego, estado, jugador, ordena=None, d=None, evalua=None,
+    trabajadores=None, ejecutor=None, pvs=False, contexto=None
+    ):
+    """
+    Devuelve la mejor jugada para el jugador en el estado, repartiendo
+    las jugadas de la raíz entre varios procesos
+
+    La primera jugada (según el ordenamiento) se busca en este proceso
+    con la ventana completa, para tener una cota alpha. Las demás se
+    mandan a los trabajadores con la mejor alpha conocida al momento de
+    enviarlas: solo hay tantas tareas en vuelo como trabajadores, así que
+    cada resultado que llega mejora la cota de las tareas que faltan.
+    Las tareas que ya estaban en vuelo se quedan con la cota con la que
+    se enviaron (podan menos, pero su valor sigue siendo correcto: con
+    beta infinita, todo valor mayor que su alpha es exacto).
+
+    Cada trabajador lleva un contexto propio por cada contexto de este
+    proceso, al que le hace nueva_busqueda una vez por jugada, así que
+    las tablas de jugadores distintos no se mezclan.
+
+    Parametros
+    ----------
+    contexto (ContextoBusqueda): contexto de este proceso para la
+        primera jugada. Si None, se usa uno solo para esta jugada
+    trabajadores (int): número de procesos, por omisión uno por núcleo
+    ejecutor (ProcessPoolExecutor): ejecutor a reutilizar entre jugadas.
+        Si None, se crea uno para esta jugada
+    El resto como en jugador_negamax
+
+    """
+    if d != None and evalua == None:
+        raise ValueError("Se necesita evalua si d no es None")
+    jugadas = list(juego.jugadas_legales(estado, jugador))
+    if ordena != None:
+        jugadas = ordena_jugadas(ordena, juego, estado, jugadas, jugador)
+    if len(jugadas) == 1:
+        return jugadas[0]
+    d_hijo = d if d == None else d - 1
+    trabajadores = trabajadores or cpu_count() or 1
+    if contexto is None:
+        contexto = ContextoBusqueda()
+    contexto.nueva_busqueda()
+    busqueda = (contexto.identidad, contexto.busquedas)
+
+    mejor = jugadas[0]
+    alpha = _busca_hijo(
+        juego, juego.transicion(estado, mejor, jugador), jugador,
+        -1e10, ordena, d_hijo, evalua, pvs, contexto
+    )
+    propio = ejecutor is None
+    if propio:
+        ejecutor = ProcessPoolExecutor(max_workers=trabajadores)
+    try:
+        pendientes = iter(jugadas[1:])
+        en_vuelo = {}
+
+        def envia():
+            a = next(pendientes, None)
+            if a is not None:
+                futuro = ejecutor.submit(
+                    _busca_hijo, juego, juego.transicion(estado, a, jugador),
+                    jugador, alpha, ordena, d_hijo, evalua, pvs, busqueda
+                )
+                en_vuelo[futuro] = a
+
+        for _ in range(trabajadores):
+            envia()
+        while en_vuelo:
+            listos, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                a = en_vuelo.pop(futuro)
+                v = futuro.result()
+                if v > alpha:
+                    alpha, mejor = v, a
+                envia()
+    finally:
+        if propio:
+            ejecutor.shutdown()
+    return mejor
+
+
+def _profundiza(
+    tabla, juego, estado, jugador, limite, ordena, d_inicial, d_max,
+    evalua, pvs, primera
+    ):
+    """
+    Búsqueda iterativa de un proceso de Lazy SMP hasta el límite de
+    tiempo, empezando en profundidad d_inicial y buscando primero la
+    jugada primera
+
+    Regresa
+    -------
+    tuple: (profundidad completada, mejor jugada), (0, None) si no
+        completó ninguna iteración
+
+    """
+    contexto = ContextoBusqueda(transp=tabla, envejece=False)
+    contexto.nueva_busqueda(limite)
+    d, traza, resultado = d_inicial, [primera], (0, None)
+    try:
+        while time() < limite and (d_max == None or d <= d_max):
+            traza, _ = negamax(
+                juego=juego, estado=estado, jugador=jugador,
+                alpha=-1e10, beta=1e10, ordena=ordena, d=d, evalua=evalua,
+                transp=tabla, traza=traza[:], contexto=contexto, pvs=pvs
+            )
+            resultado = (d, traza[0])
+            d += 1
+    except TiempoAgotado:
+        pass
+    return resultado
+
+
+def _trabajador_smp(nombre, capacidad, esquema, edad, *args):
+    """Proceso auxiliar de Lazy SMP: se conecta a la tabla compartida"""
+    tabla = TablaCompartida(capacidad, esquema, nombre=nombre, edad=edad)
+    try:
+        return _profundiza(tabla, *args)
+    finally:
+        tabla.cierra()
+
+
+def minimax_iterativo_smp(
+    juego, estado, jugador, tiempo=10, ordena=None, d=None, evalua=None,
+    trabajadores=None, ejecutor=None, tabla=None, pvs=False
+    ):
+    """
+    Devuelve la mejor jugada para el jugador en el estado acotando a un
+    periodo de tiempo, con Lazy SMP
+
+    Cada proceso hace su propia búsqueda iterativa sobre la misma raíz
+    hasta que se acaba el tiempo, y todos comparten una TablaCompartida.
+    Para que no hagan todos el mismo trabajo, la mitad empieza en una
+    profundidad mayor y cada uno busca primero una jugada distinta de la
+    raíz. Se regresa la jugada de la búsqueda que llegó más profundo
+    (la de este proceso si hay empate).
+
+    Parametros
+    ----------
+    d (int): profundidad máxima, si None solo limita el tiempo
+    trabajadores (int): número total de procesos (incluyendo este),
+        por omisión uno por núcleo
+    ejecutor (ProcessPoolExecutor): ejecutor a reutilizar entre jugadas.
+        Si None, se crea uno para esta jugada
+    tabla (TablaCompartida): tabla a reutilizar entre jugadas (se
+        envejece en cada una). Si None, se crea una para esta jugada
+    El resto como en minimax_iterativo
+
+    """
+    if evalua == None:
+        raise ValueError("Se necesita evalua para la búsqueda iterativa")
+    limite = time() + tiempo
+    jugadas = list(juego.jugadas_legales(estado, jugador))
+    if ordena != None:
+        jugadas = ordena_jugadas(ordena, juego, estado, jugadas, jugador)
+    if len(jugadas) == 1:
+        return jugadas[0]
+    trabajadores = trabajadores or cpu_count() or 1
+
+    propia = tabla is None
+    if propia:
+        tabla = TablaCompartida(1 << 18)
+    else:
+        tabla.envejece()
+    propio = ejecutor is None and trabajadores > 1
+    if propio:
+        ejecutor = ProcessPoolExecutor(max_workers=trabajadores - 1)
+    try:
+        futuros = [
+            ejecutor.submit(
+                _trabajador_smp, tabla.nombre, tabla.capacidad,
+                tabla.esquema, tabla.edad, juego, estado, jugador, limite,
+                ordena, 2 + i % 2, d, evalua, pvs, jugadas[i % len(jugadas)]
+            )
+            for i in range(1, trabajadores)
+        ]
+        resultados = [_profundiza(
+            tabla, juego, estado, jugador, limite, ordena, 2, d, evalua,
+            pvs, jugadas[0]
+        )]
+        resultados += [futuro.result() for futuro in futuros]
+    finally:
+        if propio:
+            ejecutor.shutdown()
+        if propia:
+            tabla.libera()
+    _, mejor = max(resultados, key=lambda r: r[0])
+    return mejor if mejor is not None else jugadas[0]
+
+
+def _siembra():
+    """
+    Inicializa el generador aleatorio del proceso trabajador la primera
+    vez: los procesos creados con fork heredan su estado, y todos
+    harían las mismas simulaciones
+
+    """
+    global _sembrado
+    if not _sembrado:
+        seed()
+        _sembrado = True
+
+
+def _arbol_trabajador(juego, estado, jugador, tiempo, simulaciones, c):
+    """
+    Búsqueda MCTS de un proceso con paralelismo de raíz, con el árbol
+    del proceso (se reutiliza si la tarea anterior le tocó a este mismo)
+
+    Regresa
+    -------
+    tuple: (simulaciones hechas, visitas y puntos de cada jugada de la
+        raíz)
+
+    """
+    global _arbol_proceso
+    _siembra()
+    if _arbol_proceso is None:
+        _arbol_proceso = ArbolMCTS(c)
+    _arbol_proceso.c = c
+    _arbol_proceso.busca(juego, estado, jugador, tiempo, simulaciones)
+    return _arbol_proceso.simulaciones, _arbol_proceso.visitas_raiz()
+
+
+def jugador_mcts_raiz(
+    juego, estado, jugador, tiempo=None, simulaciones=None, c=C_UCT,
+    arbol=None, trabajadores=None, ejecutor=None
+    ):
+    """
+    Devuelve la jugada para el jugador en el estado con MCTS con
+    paralelismo de raíz
+
+    Cada proceso (incluyendo este) construye su propio árbol con el
+    tiempo o el número de simulaciones dados, y al final se suman las
+    visitas de cada jugada de la raíz en todos los árboles y se regresa
+    la más visitada.
+
+    Parametros
+    ----------
+    arbol (ArbolMCTS): árbol de este proceso, a reutilizar entre
+        jugadas. En arbol.simulaciones queda el total de simulaciones de
+        todos los procesos
+    trabajadores (int): número total de procesos (incluyendo este), por
+        omisión uno por núcleo
+    ejecutor (ProcessPoolExecutor): ejecutor a reutilizar entre jugadas.
+        Si None, se crea uno para esta jugada
+    El resto como en jugador_mcts
+
+    """
+    if tiempo is None and simulaciones is None:
+        tiempo = 1
+    if arbol is None:
+        arbol = ArbolMCTS(c)
+    trabajadores = trabajadores or cpu_count() or 1
+    propio = ejecutor is None and trabajadores > 1
+    if propio:
+        ejecutor = ProcessPoolExecutor(max_workers=trabajadores - 1)
+    try:
+        futuros = [
+            ejecutor.submit(
+                _arbol_trabajador, juego, estado, jugador, tiempo,
+                simulaciones, c
+            )
+            for _ in range(1, trabajadores)
+        ]
+        arbol.busca(juego, estado, jugador, tiempo, simulaciones)
+        resultados = [(arbol.simulaciones, arbol.visitas_raiz())]
+        resultados += [futuro.result() for futuro in futuros]
+    finally:
+        if propio:
+            ejecutor.shutdown()
+    visitas = {}
+    for _, visitas_raiz in resultados:
+        for a, (n, _) in visitas_raiz.items():
+            visitas[a] = visitas.get(a, 0) + n
+    arbol.simulaciones = sum(n for n, _ in resultados)
+    if not visitas:
+        return arbol.mejor_jugada(juego)
+    return max(visitas, key=visitas.get)
+
+
+def _simula_lote(juego, hojas, repeticiones):
+    """
+    Simulaciones de un lote de hojas del paralelismo de árbol
+
+    hojas (list): (estado, jugador) de cada hoja
+
+    Regresa
+    -------
+    list: la suma de las ganancias de las repeticiones de cada hoja
+
+    """
+    _siembra()
+    return [
+        sum(simulacion(juego, estado, jugador) for _ in range(repeticiones))
+        for estado, jugador in hojas
+    ]
+
+
+def jugador_mcts_arbol(
+    juego, estado, jugador, tiempo=None, simulaciones=None, c=C_UCT,
+    arbol=None, trabajadores=None, ejecutor=None, lote=8, repeticiones=1
+    ):
+    """
+    Devuelve la jugada para el jugador en el estado con MCTS con
+    paralelismo de árbol
+
+    El árbol vive en este proceso, que solo selecciona y retropropaga:
+    selecciona lotes de hojas con pérdida virtual (para que las hojas de
+    un lote, y las de los lotes en vuelo, sean distintas) y manda las
+    simulaciones de cada lote a otro proceso. Hay dos lotes en vuelo
+    por trabajador, y en cuanto llega un resultado se retropropaga y se
+    envía otro lote. Las hojas terminales se resuelven aquí.
+
+    Parametros
+    ----------
+    arbol (ArbolMCTS): árbol a reutilizar entre jugadas. En
+        arbol.simulaciones quedan las simulaciones hechas
+    trabajadores (int): número de procesos que simulan, por omisión uno
+        por núcleo
+    ejecutor (ProcessPoolExecutor): ejecutor a reutilizar entre jugadas.
+        Si None, se crea uno para esta jugada
+    lote (int): hojas por tarea
+    repeticiones (int): simulaciones por hoja
+    El resto como en jugador_mcts
+
+    """
+    if tiempo is None and simulaciones is None:
+        tiempo = 1
+    if arbol is None:
+        arbol = ArbolMCTS(c)
+    limite = None if tiempo is None else time() + tiempo
+    arbol.reusa(juego, estado, jugador)
+    raiz = arbol.raiz
+    trabajadores = trabajadores or cpu_count() or 1
+    propio = ejecutor is None
+    if propio:
+        ejecutor = ProcessPoolExecutor(max_workers=trabajadores)
+    n = 0
+
+    def quedan():
+        return ((simulaciones is None or n < simulaciones) and
+                (limite is None or time() < limite))
+
+    def envia():
+        nonlocal n
+        hojas = []
+        while len(hojas) < lote and quedan():
+            nodo = selecciona_hoja(raiz, juego, c, virtual=True)
+            if nodo.por_expandir or nodo.hijos:
+                hojas.append(nodo)
+            else:
+                g = juego.ganancia(nodo.estado)
+                retropropaga(nodo, g * repeticiones, repeticiones, True)
+            n += repeticiones
+        if hojas:
+            futuro = ejecutor.submit(
+                _simula_lote, juego,
+                [(nodo.estado, nodo.jugador) for nodo in hojas], repeticiones
+            )
+            en_vuelo[futuro] = hojas
+
+    en_vuelo = {}
+    try:
+        for _ in range(2 * trabajadores):
+            envia()
+        while en_vuelo:
+            listos, _ = wait(en_vuelo, return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                for nodo, g in zip(en_vuelo.pop(futuro), futuro.result()):
+                    retropropaga(nodo, g, repeticiones, True)
+                if quedan():
+                    envia()
+    finally:
+        if propio:
+            ejecutor.shutdown()
+    arbol.simulaciones = n
+    return arbol.mejor_jugada(juego)
@@ -0,0 +1,296 @@
+"""
+Modulo con el banco de pruebas de rendimiento de los motores
+
+    1- Conjuntos fijos de posiciones (aperturas, medio juego y tácticas)
+       del gato, Conecta4 y UltimateTicTacToe, en el directorio posiciones
+    2- Búsqueda de cada posición con cada par de ordenamiento y
+       evaluación, con profundidad iterativa (como minimax_iterativo)
+       hasta una profundidad fija, midiendo nodos, nodos por segundo,
+       tiempo hasta cada profundidad y la mejor jugada
+    3- Resultados en un archivo JSON, y comparación contra los de una
+       corrida base para encontrar regresiones
+
+Cada archivo de posiciones es una lista JSON de posiciones con nombre,
+tipo (apertura, medio o tactica), las jugadas desde inicializa() que
+llevan a ella y, opcionalmente, las jugadas esperadas. Las jugadas de
+UltimateTicTacToe se escriben como listas [tablero, posición].
+
+Todos los ordenamientos son deterministas, así que el número de nodos
+de una corrida a otra solo cambia si cambia la búsqueda.
+
+Uso desde la línea de comandos:
+
+    python rendimiento.py resultados.json
+    python rendimiento.py nuevos.json --base resultados.json
+
+"""
+from datetime import datetime
+from json import dump, load
+from os import path
+from platform import platform, python_version
+from time import perf_counter
+
+from minimax import negamax, ContextoBusqueda
+from gato import Gato
+from conect4 import Conecta4, ordena_centro, ordena_avanzado
+from conect4 import evalua_3con, evalua3_avanzada, EvaluadorConecta4
+from conect4 import evalua3_avanzada_lotes, np
+from ultimate_tictaetoe import UltimateTicTacToe, ordena_centro_ultimate
+from ultimate_tictaetoe import ordena_con_estado_actual
+from ultimate_tictaetoe import evalua_simple_ultimate, evalua_avanzada_ultimate
+from ultimate_tictaetoe import evalua_avanzada_ultimate_lotes
+
+DIRECTORIO_POSICIONES = path.join(path.dirname(__file__), 'posiciones')
+
+def ordena_fijo(jugadas, jugador):
+    """Deja las jugadas en el orden del juego (para nodos reproducibles)"""
+    return jugadas
+
+
+# Por juego: (clase del juego, profundidad, lista de configuraciones
+# (nombre, ordena, evalua)). Con profundidad None se busca hasta el final.
+# Las configuraciones /lotes (con NumPy) son experimentales y no se
+# recomiendan por omisión: evaluar por lotes pierde poda entre las hojas
+# y es más lenta que centro/incremental y estrategico/avanzada (ver
+# minimax.EvaluacionPorLotes); están aquí para medirla
+CONFIGURACIONES = {
+    'gato': (Gato, None, [('fijo', ordena_fijo, None)]),
+    'conecta4': (Conecta4, 5, [
+        ('centro/3con', ordena_centro, evalua_3con),
+        ('centro/avanzada', ordena_centro, evalua3_avanzada),
+        ('centro/incremental', ordena_centro, EvaluadorConecta4()),
+        ('avanzado/incremental', ordena_avanzado, EvaluadorConecta4()),
+    ] + ([
+        ('centro/lotes', ordena_centro, evalua3_avanzada_lotes),
+    ] if np is not None else [])),
+    'ultimate': (UltimateTicTacToe, 4, [
+        ('centro/simple', ordena_centro_ultimate, evalua_simple_ultimate),
+        ('estrategico/avanzada', ordena_con_estado_actual,
+         evalua_avanzada_ultimate),
+    ] + ([
+        ('estrategico/lotes', ordena_con_estado_actual,
+         evalua_avanzada_ultimate_lotes),
+    ] if np is not None else [])),
+}
+
+
+def _jugada(a):
+    """Jugada leída de JSON (las listas se vuelven tuplas)"""
+    return tuple(a) if isinstance(a, list) else a
+
+
+def carga_posiciones(nombre, directorio=DIRECTORIO_POSICIONES):
+    """
+    Lee las posiciones del juego nombre (posiciones/<nombre>.json)
+
+    Regresa
+    -------
+    list: diccionarios con nombre, tipo, jugadas y esperadas (las
+        jugadas como las usa el juego)
+
+    """
+    with open(path.join(directorio, nombre + '.json')) as f:
+        posiciones = load(f)
+    for p in posiciones:
+        p['jugadas'] = [_jugada(a) for a in p['jugadas']]
+        p['esperadas'] = [_jugada(a) for a in p.get('esperadas', [])]
+    return posiciones
+
+
+def reproduce(juego, jugadas):
+    """
+    Estado y jugador en turno después de las jugadas desde inicializa()
+
+    Lanza ValueError si alguna jugada no es legal o la posición final
+    es terminal
+
+    """
+    s, j = juego.inicializa()
+    for a in jugadas:
+        if a not in juego.jugadas_legales(s, j):
+            raise ValueError(f"La jugada {a} no es legal")
+        s, j = juego.transicion(s, a, j), -j
+    if juego.terminal(s):
+        raise ValueError("La posición es terminal")
+    return s, j
+
+
+def mide_posicion(juego, s, j, ordena, evalua, d):
+    """
+    Busca la posición con profundidad iterativa de 1 a d (una sola
+    búsqueda si d es None), con un contexto nuevo que comparten todas
+    las iteraciones
+
+    Regresa
+    -------
+    dict: nodos, segundos, nps y jugada de la búsqueda completa, y en
+        profundidades el tiempo acumulado, los nodos, la jugada y el
+        valor al terminar cada iteración
+
+    """
+    contexto = ContextoBusqueda()
+    contexto.nueva_busqueda()
+    profundidades, traza = [], []
+    inicio = perf_counter()
+    for d_i in ([None] if d is None else range(1, d + 1)):
+        traza, v = negamax(
+            juego, s, j, ordena=ordena, d=d_i, evalua=evalua,
+            transp=contexto.transp, traza=traza[:], contexto=contexto
+        )
+        profundidades.append({
+            'd': d_i, 'segundos': perf_counter() - inicio,
+            'nodos': contexto.nodos, 'jugada': traza[0], 'valor': v
+        })
+    segundos = perf_counter() - inicio
+    return {
+        'nodos': contexto.nodos,
+        'segundos': segundos,
+        'nps': contexto.nodos / segundos if segundos else 0.0,
+        'jugada': traza[0],
+        'profundidades': profundidades,
+    }
+
+
+def corre(juegos=None, d=None, repeticiones=3, progreso=True):
+    """
+    Corre el banco de pruebas
+
+    Parametros
+    ----------
+    juegos (list): nombres de los juegos (claves de CONFIGURACIONES),
+        por omisión todos
+    d (int): profundidad para todos los juegos en lugar de la de
+        CONFIGURACIONES. Las configuraciones sin evaluación (el gato)
+        siempre buscan hasta el final
+    repeticiones (int): veces que se mide cada búsqueda; se queda la
+        más rápida (los nodos son los mismos)
+    progreso (bool): imprimir cada resultado
+
+    Regresa
+    -------
+    dict: maquina, fecha y resultados, uno por juego, configuración y
+        posición
+
+    """
+    resultados = []
+    for nombre in juegos or CONFIGURACIONES:
+        clase, d_juego, configuraciones = CONFIGURACIONES[nombre]
+        juego = clase()
+        for posicion in carga_posiciones(nombre):
+            s, j = reproduce(juego, posicion['jugadas'])
+            for configuracion, ordena, evalua in configuraciones:
+                # Sin evaluación (el gato) se busca hasta el final
+                d_config = d_juego if d is None or evalua is None else d
+                medida = min((
+                    mide_posicion(
+                        juego, s, j, ordena, evalua, d_config
+                    ) for _ in range(repeticiones)
+                ), key=lambda m: m['segundos'])
+                resultado = {
+                    'juego': nombre, 'configuracion': configuracion,
+                    'posicion': posicion['nombre'], 'tipo': posicion['tipo'],
+                    **medida,
+                }
+                if posicion['esperadas']:
+                    resultado['correcta'] = (
+                        medida['jugada'] in posicion['esperadas']
+                    )
+                resultados.append(resultado)
+                if progreso:
+                    print(
+                        f"{nombre:>9} {configuracion:>21} "
+                        f"{posicion['nombre']:>18}: {medida['nodos']:8d} nodos "
+                        f"{medida['segundos']:7.3f} s {medida['nps']:9.0f} n/s "
+                        f"jugada {medida['jugada']}"
+                    )
+    return {
+        'maquina': {
+            'python': python_version(), 'plataforma': platform(),
+            'numpy': np is not None,
+        },
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'resultados': resultados,
+    }
+
+
+def guarda(resultados, archivo):
+    """Escribe los resultados de corre en un archivo JSON"""
+    with open(archivo, 'w') as f:
+        dump(resultados, f, indent=1)
+
+
+def compara(actuales, base, tolerancia=0.1, imprime=True):
+    """
+    Compara los resultados de dos corridas (los dict de corre, o los
+    archivos donde se guardaron) posición por posición
+
+    Es regresión que los nodos por segundo bajen más de la tolerancia
+    (relativa), que los nodos aumenten o que cambie la jugada. Las
+    posiciones que no están en las dos corridas se ignoran.
+
+    Regresa
+    -------
+    list: (juego, configuracion, posicion, motivo) de cada regresión
+
+    """
+    if isinstance(actuales, str):
+        with open(actuales) as f:
+            actuales = load(f)
+    if isinstance(base, str):
+        with open(base) as f:
+            base = load(f)
+
+    def indice(corrida):
+        return {
+            (r['juego'], r['configuracion'], r['posicion']): r
+            for r in corrida['resultados']
+        }
+
+    indice_base = indice(base)
+    regresiones = []
+    for clave, r in indice(actuales).items():
+        r_base = indice_base.get(clave)
+        if r_base is None:
+            continue
+        razon_nps = r['nps'] / r_base['nps'] if r_base['nps'] else 1.0
+        motivos = []
+        if razon_nps < 1 - tolerancia:
+            motivos.append(f"nps {razon_nps:.2f}x")
+        if r['nodos'] > r_base['nodos']:
+            motivos.append(f"nodos {r_base['nodos']} -> {r['nodos']}")
+        if _jugada(r['jugada']) != _jugada(r_base['jugada']):
+            motivos.append(f"jugada {r_base['jugada']} -> {r['jugada']}")
+        regresiones += [clave + (motivo,) for motivo in motivos]
+        if imprime:
+            print(
+                f"{clave[0]:>9} {clave[1]:>21} {clave[2]:>18}: "
+                f"nps {razon_nps:5.2f}x nodos {r_base['nodos']:8d} -> "
+                f"{r['nodos']:8d}" + ("  REGRESION" if motivos else "")
+            )
+    return regresiones
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    import sys
+
+    parser = ArgumentParser(description="Banco de pruebas de rendimiento")
+    parser.add_argument('archivo', help="archivo JSON para los resultados")
+    parser.add_argument('--juegos', nargs='+', choices=list(CONFIGURACIONES))
+    parser.add_argument('--d', type=int,
+                        help="profundidad para todos los juegos (los que "
+                        "no tienen evaluación buscan hasta el final)")
+    parser.add_argument('--repeticiones', type=int, default=3,
+                        help="veces que se mide cada búsqueda")
+    parser.add_argument('--base', help="resultados base para comparar")
+    parser.add_argument('--tolerancia', type=float, default=0.1,
+                        help="baja relativa de nodos/s que es regresión")
+    args = parser.parse_args()
+
+    resultados = corre(args.juegos, args.d, args.repeticiones)
+    guarda(resultados, args.archivo)
+    if args.base:
+        regresiones = compara(resultados, args.base, args.tolerancia)
+        for juego, configuracion, posicion, motivo in regresiones:
+            print(f"Regresión en {juego} {configuracion} {posicion}: {motivo}")
+        sys.exit(1 if regresiones else 0)
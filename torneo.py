@@ -0,0 +1,388 @@
+"""
+Modulo con los torneos entre motores
+
+    1- Motores: una búsqueda (negamax a profundidad fija o iterativa con
+       tiempo por jugada) con un par de ordenamiento y evaluación
+    2- Aperturas aleatorias: cada apertura se juega dos veces, una con
+       cada motor de X, para que el resultado no dependa del sorteo
+    3- Torneo todos contra todos en varios procesos, que escribe cada
+       partida en un archivo de líneas JSON en cuanto termina
+    4- Resumen de un torneo (aunque no haya terminado): ganadas,
+       empatadas y perdidas de cada motor, y diferencia de Elo de cada
+       pareja con su margen de error
+
+Los motores y el juego se envían a otros procesos, así que tienen que
+poder serializarse con pickle (funciones definidas a nivel de módulo,
+no lambdas).
+
+Uso desde la línea de comandos (los motores son las configuraciones de
+rendimiento.CONFIGURACIONES):
+
+    python torneo.py conecta4 centro/3con centro/avanzada --tiempo 1 \\
+        --aperturas 20 --archivo torneo.jsonl
+
+y para comprobar que todas las configuraciones de todos los juegos
+juegan, con tiempo y a profundidad fija:
+
+    python torneo.py --verifica
+
+"""
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import combinations
+from json import dumps, loads
+from math import log10, sqrt
+from os import cpu_count
+from random import Random
+from time import perf_counter
+
+from juegos_simplificado import juega_dos_jugadores
+from minimax import jugador_negamax, minimax_iterativo, ContextoBusqueda
+
+class Motor:
+    """
+    Jugador automático de un torneo
+
+    Con tiempo juega con minimax_iterativo y ese tiempo por jugada, si no
+    con jugador_negamax a profundidad d. Sin evaluación (el gato) no hay
+    profundidad iterativa posible, así que siempre busca hasta el final
+    con jugador_negamax. Cada partida usa un contexto de búsqueda nuevo.
+
+    """
+    def __init__(self, nombre, ordena=None, evalua=None, d=None,
+                 tiempo=None, pvs=False, finales=None):
+        """
+        nombre (str): nombre del motor en los resultados
+        ordena, evalua, d, pvs, finales: como en jugador_negamax
+        tiempo (float): segundos por jugada, o None para buscar a
+            profundidad d
+
+        """
+        self.nombre = nombre
+        self.ordena = ordena
+        self.evalua = evalua
+        self.d = d
+        self.tiempo = tiempo
+        self.pvs = pvs
+        self.finales = finales
+
+    def jugador(self):
+        """Función jugador(juego, s, j) para una partida nueva"""
+        contexto = ContextoBusqueda()
+
+        def jugador_motor(juego, s, j):
+            if self.tiempo is not None and self.evalua is not None:
+                return minimax_iterativo(
+                    juego, s, j, tiempo=self.tiempo, ordena=self.ordena,
+                    evalua=self.evalua, contexto=contexto, pvs=self.pvs,
+                    finales=self.finales
+                )
+            return jugador_negamax(
+                juego, s, j, ordena=self.ordena, d=self.d,
+                evalua=self.evalua, contexto=contexto, pvs=self.pvs,
+                finales=self.finales
+            )
+        return jugador_motor
+
+
+def motores_configuracion(juego, nombres, d=4, tiempo=None):
+    """
+    Los Motor de las configuraciones nombres del juego en
+    rendimiento.CONFIGURACIONES (como los arma la línea de comandos)
+
+    Regresa
+    -------
+    tuple: (el juego, la lista de Motor)
+
+    """
+    from rendimiento import CONFIGURACIONES
+
+    clase, _, configuraciones = CONFIGURACIONES[juego]
+    configuraciones = {c[0]: c for c in configuraciones}
+    motores = []
+    for nombre in nombres:
+        _, ordena, evalua = configuraciones[nombre]
+        # Sin evaluación (el gato) se busca hasta el final
+        motores.append(Motor(
+            nombre, ordena, evalua, d if evalua is not None else None, tiempo
+        ))
+    return clase(), motores
+
+
+def verifica_configuraciones(tiempo=0.05, d=2):
+    """
+    Juega una partida corta con cada configuración de cada juego de
+    rendimiento.CONFIGURACIONES, con tiempo por jugada y a profundidad
+    fija, como lo haría la línea de comandos. Lanza la excepción del
+    primer motor que falle
+
+    """
+    from rendimiento import CONFIGURACIONES
+
+    for juego, (_, _, configuraciones) in CONFIGURACIONES.items():
+        nombres = [c[0] for c in configuraciones]
+        for t in (tiempo, None):
+            modelo, motores = motores_configuracion(juego, nombres, d, t)
+            apertura = aperturas_aleatorias(modelo, 1, semilla=0)[0]
+            for motor in motores:
+                juega_partida(modelo, motor, motor, apertura)
+
+
+def aperturas_aleatorias(juego, n, jugadas=2, semilla=None):
+    """
+    Hasta n aperturas distintas de jugadas jugadas al azar desde
+    inicializa(), que no terminan el juego
+
+    Regresa
+    -------
+    list: listas de jugadas
+
+    """
+    azar = Random(semilla)
+    aperturas = []
+    for _ in range(100 * n):
+        if len(aperturas) == n:
+            break
+        s, j = juego.inicializa()
+        apertura = []
+        for _ in range(jugadas):
+            a = azar.choice(list(juego.jugadas_legales(s, j)))
+            apertura.append(a)
+            s, j = juego.transicion(s, a, j), -j
+            if juego.terminal(s):
+                break
+        if not juego.terminal(s) and apertura not in aperturas:
+            aperturas.append(apertura)
+    return aperturas
+
+
+def _cronometrado(jugador, tiempos):
+    """Jugador que agrega a tiempos lo que tarda en cada jugada"""
+    def jugador_cronometrado(juego, s, j):
+        inicio = perf_counter()
+        a = jugador(juego, s, j)
+        tiempos.append(perf_counter() - inicio)
+        return a
+    return jugador_cronometrado
+
+
+def juega_partida(juego, motor_x, motor_o, apertura):
+    """
+    Juega una partida desde la apertura, con motor_x como jugador 1
+
+    Regresa
+    -------
+    dict: nombres de x y o, apertura, ganancia (para x), número de
+        jugadas, y por motor el tiempo total y el de la jugada más larga
+
+    """
+    s, j = juego.inicializa()
+    for a in apertura:
+        s, j = juego.transicion(s, a, j), -j
+    tiempos_x, tiempos_o = [], []
+    ganancia, _ = juega_dos_jugadores(
+        juego,
+        _cronometrado(motor_x.jugador(), tiempos_x),
+        _cronometrado(motor_o.jugador(), tiempos_o),
+        inicial=(s, j)
+    )
+    return {
+        'x': motor_x.nombre, 'o': motor_o.nombre, 'apertura': apertura,
+        'ganancia': ganancia, 'jugadas': len(tiempos_x) + len(tiempos_o),
+        'segundos': {motor_x.nombre: sum(tiempos_x),
+                     motor_o.nombre: sum(tiempos_o)},
+        'maximo': {motor_x.nombre: max(tiempos_x, default=0.0),
+                   motor_o.nombre: max(tiempos_o, default=0.0)},
+    }
+
+
+def torneo(juego, motores, aperturas, archivo=None, trabajadores=None,
+           ejecutor=None, progreso=True):
+    """
+    Torneo todos contra todos: cada pareja de motores juega cada
+    apertura dos veces, cambiando de color
+
+    Las partidas se reparten entre varios procesos, y cada una se agrega
+    al archivo (una línea JSON) en cuanto termina, así que el archivo se
+    puede resumir mientras el torneo sigue.
+
+    Parametros
+    ----------
+    juego (ModeloJuegoZT2): el juego
+    motores (list): los Motor del torneo (con nombres distintos)
+    aperturas (list): listas de jugadas desde inicializa()
+    archivo (str): archivo donde se agregan las partidas, o None
+    trabajadores (int): número de procesos, por omisión uno por núcleo
+    ejecutor (ProcessPoolExecutor): ejecutor a reutilizar. Si None, se
+        crea uno para el torneo
+    progreso (bool): imprimir cada partida al terminar
+
+    Regresa
+    -------
+    list: los resultados de juega_partida
+
+    """
+    partidas = [
+        (x, o, apertura)
+        for m1, m2 in combinations(motores, 2)
+        for apertura in aperturas
+        for x, o in ((m1, m2), (m2, m1))
+    ]
+    propio = ejecutor is None
+    if propio:
+        ejecutor = ProcessPoolExecutor(
+            max_workers=trabajadores or cpu_count() or 1
+        )
+    resultados = []
+    try:
+        futuros = [
+            ejecutor.submit(juega_partida, juego, x, o, apertura)
+            for x, o, apertura in partidas
+        ]
+        for futuro in as_completed(futuros):
+            resultado = futuro.result()
+            resultados.append(resultado)
+            if archivo is not None:
+                with open(archivo, 'a') as f:
+                    f.write(dumps(resultado) + '\n')
+            if progreso:
+                print(
+                    f"[{len(resultados)}/{len(partidas)}] "
+                    f"{resultado['x']} (X) vs {resultado['o']} (O): "
+                    + {1: "gana X", -1: "gana O", 0: "empate"}[
+                        resultado['ganancia']]
+                )
+    finally:
+        if propio:
+            ejecutor.shutdown(cancel_futures=True)
+    return resultados
+
+
+def elo(puntos):
+    """
+    Diferencia de Elo que corresponde a los puntos (1, 0.5 o 0) de un
+    jugador en una serie de partidas, con un margen del 95%
+
+    Regresa
+    -------
+    tuple: (diferencia, margen). La diferencia es +-inf si ganó o perdió
+        todas, y el margen es None si no hay con qué estimarlo
+
+    """
+    n = len(puntos)
+    p = sum(puntos) / n
+
+    def diferencia(p):
+        if p <= 0:
+            return float('-inf')
+        if p >= 1:
+            return float('inf')
+        return -400 * log10(1 / p - 1)
+
+    desviacion = sqrt(sum((x - p) ** 2 for x in puntos) / n / n)
+    if desviacion == 0:
+        return diferencia(p), None
+    margen = (
+        diferencia(p + 1.96 * desviacion) - diferencia(p - 1.96 * desviacion)
+    ) / 2
+    return diferencia(p), margen
+
+
+def resumen(resultados):
+    """
+    Resumen de un torneo
+
+    resultados (list o str): los resultados de torneo, o el archivo
+        donde se escribieron
+
+    Regresa
+    -------
+    tuple: (motores, parejas) donde motores es un dict nombre ->
+        {ganadas, empatadas, perdidas, puntos, porcentaje} y parejas un
+        dict (nombre1, nombre2) -> {partidas, puntos (de nombre1),
+        elo (de nombre1 sobre nombre2), margen}
+
+    """
+    if isinstance(resultados, str):
+        with open(resultados) as f:
+            resultados = [loads(linea) for linea in f if linea.strip()]
+    conteos = defaultdict(lambda: [0, 0, 0])
+    puntos_pareja = defaultdict(list)
+    for r in resultados:
+        for nombre, signo in ((r['x'], 1), (r['o'], -1)):
+            conteos[nombre][(1 - signo * r['ganancia'])] += 1
+        puntos_x = (1 + r['ganancia']) / 2
+        if r['x'] < r['o']:
+            puntos_pareja[r['x'], r['o']].append(puntos_x)
+        else:
+            puntos_pareja[r['o'], r['x']].append(1 - puntos_x)
+    motores = {}
+    for nombre, (ganadas, empatadas, perdidas) in conteos.items():
+        puntos = ganadas + empatadas / 2
+        motores[nombre] = {
+            'ganadas': ganadas, 'empatadas': empatadas, 'perdidas': perdidas,
+            'puntos': puntos,
+            'porcentaje': 100 * puntos / (ganadas + empatadas + perdidas),
+        }
+    parejas = {}
+    for pareja, puntos in puntos_pareja.items():
+        diferencia, margen = elo(puntos)
+        parejas[pareja] = {
+            'partidas': len(puntos), 'puntos': sum(puntos),
+            'elo': diferencia, 'margen': margen,
+        }
+    return motores, parejas
+
+
+def imprime_resumen(resultados):
+    """Imprime el resumen de un torneo (ver resumen)"""
+    motores, parejas = resumen(resultados)
+    print(f"{'motor':>24} {'G':>4} {'E':>4} {'P':>4} {'puntos':>7} {'%':>6}")
+    for nombre, m in sorted(motores.items(), key=lambda x: -x[1]['puntos']):
+        print(f"{nombre:>24} {m['ganadas']:4d} {m['empatadas']:4d} "
+              f"{m['perdidas']:4d} {m['puntos']:7.1f} {m['porcentaje']:6.1f}")
+    for (nombre1, nombre2), p in parejas.items():
+        margen = "" if p['margen'] is None else f" +- {p['margen']:.0f}"
+        print(f"{nombre1} vs {nombre2}: {p['puntos']:.1f}/{p['partidas']}, "
+              f"Elo {p['elo']:+.0f}{margen}")
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    from rendimiento import CONFIGURACIONES
+
+    parser = ArgumentParser(description="Torneo entre motores")
+    parser.add_argument('juego', nargs='?', choices=list(CONFIGURACIONES))
+    parser.add_argument('motores', nargs='*',
+                        help="configuraciones de rendimiento.CONFIGURACIONES")
+    parser.add_argument('--tiempo', type=float,
+                        help="segundos por jugada (búsqueda iterativa)")
+    parser.add_argument('--d', type=int, default=4,
+                        help="profundidad si no se da --tiempo")
+    parser.add_argument('--aperturas', type=int, default=10,
+                        help="número de aperturas aleatorias")
+    parser.add_argument('--jugadas', type=int, default=2,
+                        help="jugadas de cada apertura")
+    parser.add_argument('--semilla', type=int)
+    parser.add_argument('--trabajadores', type=int)
+    parser.add_argument('--archivo', help="archivo de líneas JSON")
+    parser.add_argument('--verifica', action='store_true',
+                        help="probar todas las configuraciones y salir")
+    args = parser.parse_args()
+
+    if args.verifica:
+        verifica_configuraciones()
+        print("Todas las configuraciones juegan")
+        raise SystemExit
+    if args.juego is None or not args.motores:
+        parser.error("se necesitan el juego y los motores")
+    juego, motores = motores_configuracion(
+        args.juego, args.motores, args.d, args.tiempo
+    )
+    aperturas = aperturas_aleatorias(
+        juego, args.aperturas, args.jugadas, args.semilla
+    )
+    resultados = torneo(
+        juego, motores, aperturas, args.archivo, args.trabajadores
+    )
+    imprime_resumen(resultados)
@@ -0,0 +1,479 @@
+"""
+Modulo con las tablas de transposición para el negamax
+
+    1- Claves de Zobrist para calcular el hash de un estado de forma
+       incremental
+    2- Tabla de transposición de capacidad fija, con esquema de reemplazo
+       configurable
+    3- Tabla de transposición en memoria compartida entre procesos
+    4- Claves canónicas bajo las simetrías del tablero
+
+Las entradas son tuplas (valor, profundidad, cota, mejor jugada), donde
+la cota indica si el valor es EXACTO, una cota INFERIOR (hubo corte beta)
+o una cota SUPERIOR (ninguna jugada superó a alpha).
+
+Un juego que quiera usar hashing de Zobrist implementa, además de los
+métodos de ModeloJuegoZT2, los métodos
+
+    zobrist(s): hash de 64 bits del estado s
+    zobrist_transicion(h, s, a, j, s_nuevo): hash de s_nuevo, el estado que
+        resulta de transicion(s, a, j), a partir del hash h de s
+
+"""
+from itertools import product
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from random import Random
+from struct import pack, unpack, pack_into
+from sys import version_info
+
+# Tipos de cota de una entrada
+EXACTO, INFERIOR, SUPERIOR = 0, 1, 2
+
+def claves_zobrist(n, m=2, semilla=0):
+    """
+    Genera las claves de Zobrist para n casillas con m valores posibles
+    (por omisión, una clave por jugador)
+
+    Regresa
+    -------
+    tuple: n tuplas con m enteros aleatorios de 64 bits
+
+    """
+    aleatorio = Random(semilla)
+    return tuple(
+        tuple(aleatorio.getrandbits(64) for _ in range(m))
+        for _ in range(n)
+    )
+
+
+def profundidad(d):
+    """
+    Profundidad de una entrada como número: d=None (búsqueda
+    hasta el final) vale más que cualquier profundidad
+
+    """
+    return float('inf') if d is None else d
+
+
+class TablaTransposicion:
+    """
+    Tabla de transposición de capacidad fija
+
+    Se usa como un diccionario (get y asignación por clave) cuyas
+    entradas son tuplas cuyo segundo elemento es la profundidad de la
+    búsqueda. Cada clave se asigna a una cubeta con dos casillas:
+
+        'dos_niveles': una casilla que prefiere la entrada más profunda
+            y otra que siempre se reemplaza
+        'profundidad': solo la casilla que prefiere la más profunda
+        'siempre': solo la casilla que siempre se reemplaza
+
+    Así la memoria es constante sin importar lo largo del juego, y cada
+    consulta cuesta O(1).
+
+    Cada entrada guarda la edad de la tabla al momento de escribirse. Al
+    llamar a envejece() (por ejemplo, antes de cada jugada) las entradas
+    de búsquedas anteriores se siguen consultando, pero la casilla que
+    prefiere profundidad las reemplaza primero.
+
+    """
+    ESQUEMAS = ('dos_niveles', 'profundidad', 'siempre')
+
+    def __init__(self, capacidad=1 << 16, esquema='dos_niveles'):
+        """
+        capacidad (int): número de cubetas, potencia de 2
+        esquema (str): esquema de reemplazo
+
+        """
+        if capacidad < 1 or capacidad & (capacidad - 1):
+            raise ValueError("capacidad debe ser una potencia de 2")
+        if esquema not in self.ESQUEMAS:
+            raise ValueError(f"esquema debe ser uno de {self.ESQUEMAS}")
+        self.capacidad = capacidad
+        self.esquema = esquema
+        self._mascara = capacidad - 1
+        self.edad = 0
+        self._profundas = [None] * capacidad
+        self._recientes = (
+            [None] * capacidad if esquema == 'dos_niveles' else None
+        )
+
+    def get(self, clave, defecto=None):
+        i = hash(clave) & self._mascara
+        casilla = self._profundas[i]
+        if casilla is not None and casilla[0] == clave:
+            return casilla[1]
+        if self._recientes is not None:
+            casilla = self._recientes[i]
+            if casilla is not None and casilla[0] == clave:
+                return casilla[1]
+        return defecto
+
+    def __contains__(self, clave):
+        return self.get(clave) is not None
+
+    def __getitem__(self, clave):
+        entrada = self.get(clave)
+        if entrada is None:
+            raise KeyError(clave)
+        return entrada
+
+    def __setitem__(self, clave, entrada):
+        i = hash(clave) & self._mascara
+        if self.esquema == 'siempre':
+            self._profundas[i] = (clave, entrada, self.edad)
+            return
+        casilla = self._profundas[i]
+        if (casilla is None or casilla[0] == clave or
+                casilla[2] != self.edad or
+                profundidad(entrada[1]) >= profundidad(casilla[1][1])):
+            self._profundas[i] = (clave, entrada, self.edad)
+        elif self._recientes is not None:
+            self._recientes[i] = (clave, entrada, self.edad)
+
+    def __len__(self):
+        return sum(
+            1 for casillas in (self._profundas, self._recientes)
+            if casillas is not None for c in casillas if c is not None
+        )
+
+    def envejece(self):
+        """Marca como viejas todas las entradas actuales"""
+        self.edad += 1
+
+    def limpia(self):
+        """Borra todas las entradas"""
+        self._profundas = [None] * self.capacidad
+        if self._recientes is not None:
+            self._recientes = [None] * self.capacidad
+
+
+def _adjunta(nombre):
+    """
+    Abre un bloque de memoria compartida ya creado sin registrarlo en el
+    resource_tracker: si se registra, el tracker de un proceso que no es
+    el creador avisa que "se fugó" y lo destruye al terminar ese proceso,
+    aunque otros lo sigan usando. Solo el creador lo registra y destruye
+
+    """
+    if version_info >= (3, 13):
+        return SharedMemory(name=nombre, track=False)
+    # Antes de 3.13 SharedMemory siempre lo registra. No basta con quitar
+    # el registro después, porque con un tracker compartido (fork, spawn)
+    # eso quitaría también el del creador
+    registra = resource_tracker.register
+    resource_tracker.register = lambda nombre, tipo: None
+    try:
+        return SharedMemory(name=nombre)
+    finally:
+        resource_tracker.register = registra
+
+
+class TablaCompartida(TablaTransposicion):
+    """
+    Tabla de transposición en memoria compartida (multiprocessing)
+
+    Se comporta como TablaTransposicion, pero las entradas se guardan
+    empacadas en un bloque de memoria compartida, de forma que varios
+    procesos pueden leer y escribir la misma tabla. Cada casilla ocupa
+    24 bytes:
+
+        verificación (8 bytes): clave XOR los dos enteros de los datos
+        valor (8 bytes, float), profundidad (1 byte, 127 si es None),
+        edad y cota (1 byte), jugada (2 bytes), 4 bytes de relleno
+
+    No se usan candados: si dos procesos escriben la misma casilla al
+    mismo tiempo, la verificación no coincide y la entrada se descarta
+    al leerla (hashing sin candados de Hyatt).
+
+    Las claves deben ser enteros (hashing de Zobrist); cualquier otra
+    clave se reduce con hash(). Las jugadas deben ser enteros de 0 a 255
+    o pares de enteros de 0 a 15 (como las de Conecta4 y Gato, o las de
+    UltimateTicTacToe).
+
+    """
+    FORMATO = '<dbBh4x'
+    TAM_CASILLA = 24
+
+    def __init__(self, capacidad=1 << 16, esquema='dos_niveles',
+                 nombre=None, edad=0):
+        """
+        capacidad (int): número de cubetas, potencia de 2
+        esquema (str): esquema de reemplazo
+        nombre (str): nombre de un bloque de memoria compartida ya creado
+            por otra TablaCompartida. Si None, se crea uno nuevo, y esta
+            tabla es la única que lo destruye (en libera)
+        edad (int): edad inicial de la tabla en este proceso
+
+        """
+        if capacidad < 1 or capacidad & (capacidad - 1):
+            raise ValueError("capacidad debe ser una potencia de 2")
+        if esquema not in self.ESQUEMAS:
+            raise ValueError(f"esquema debe ser uno de {self.ESQUEMAS}")
+        self.capacidad = capacidad
+        self.esquema = esquema
+        self._mascara = capacidad - 1
+        self.edad = edad
+        tam = 2 * capacidad * self.TAM_CASILLA
+        self._propia = nombre is None
+        if nombre is None:
+            self.memoria = SharedMemory(create=True, size=tam)
+        else:
+            self.memoria = _adjunta(nombre)
+        self._buf = self.memoria.buf
+        self.nombre = self.memoria.name
+
+    def _lee(self, desp):
+        """Devuelve (clave, datos) de la casilla, o None si está vacía"""
+        crudo = bytes(self._buf[desp:desp + self.TAM_CASILLA])
+        verificacion, w1, w2 = unpack('<QQQ', crudo)
+        if verificacion == w1 == w2 == 0:
+            return None
+        return verificacion ^ w1 ^ w2, unpack(self.FORMATO, crudo[8:])
+
+    def _escribe(self, desp, clave, entrada):
+        v, d, cota, a = entrada
+        datos = pack(
+            self.FORMATO, v, 127 if d is None else d,
+            (self.edad % 64) << 2 | cota, codifica_jugada(a)
+        )
+        w1, w2 = unpack('<QQ', datos)
+        pack_into('<Q', self._buf, desp, clave ^ w1 ^ w2)
+        self._buf[desp + 8:desp + self.TAM_CASILLA] = datos
+
+    def get(self, clave, defecto=None):
+        clave = _clave_64(clave)
+        desp = 2 * (clave & self._mascara) * self.TAM_CASILLA
+        for casilla in (desp, desp + self.TAM_CASILLA):
+            leido = self._lee(casilla)
+            if leido is not None and leido[0] == clave:
+                v, d, meta, a = leido[1]
+                return (
+                    v, None if d == 127 else d, meta & 3,
+                    decodifica_jugada(a)
+                )
+        return defecto
+
+    def __setitem__(self, clave, entrada):
+        clave = _clave_64(clave)
+        desp = 2 * (clave & self._mascara) * self.TAM_CASILLA
+        if self.esquema == 'siempre':
+            self._escribe(desp, clave, entrada)
+            return
+        leido = self._lee(desp)
+        if (leido is None or leido[0] == clave or
+                leido[1][2] >> 2 != self.edad % 64 or
+                profundidad(entrada[1]) >= profundidad(
+                    None if leido[1][1] == 127 else leido[1][1])):
+            self._escribe(desp, clave, entrada)
+        elif self.esquema == 'dos_niveles':
+            self._escribe(desp + self.TAM_CASILLA, clave, entrada)
+
+    def __len__(self):
+        return sum(
+            1 for i in range(2 * self.capacidad)
+            if self._lee(i * self.TAM_CASILLA) is not None
+        )
+
+    def limpia(self):
+        """Borra todas las entradas"""
+        self._buf[:] = bytes(len(self._buf))
+
+    def cierra(self):
+        """Deja de usar la memoria compartida en este proceso"""
+        self._buf = None
+        self.memoria.close()
+
+    def libera(self):
+        """
+        Cierra y destruye el bloque de memoria compartida (solo la tabla
+        que lo creó lo destruye; las demás solo lo cierran)
+
+        """
+        self.cierra()
+        if self._propia:
+            self.memoria.unlink()
+
+
+def _clave_64(clave):
+    """Clave como entero sin signo de 64 bits"""
+    if type(clave) != int:
+        clave = hash(clave)
+    return clave & 0xFFFFFFFFFFFFFFFF
+
+
+def codifica_jugada(a):
+    """Codifica una jugada en un entero de 16 bits (ver TablaCompartida)"""
+    if a is None:
+        return -1
+    if type(a) == tuple:
+        return 256 + 16 * a[0] + a[1]
+    return a
+
+
+def decodifica_jugada(x):
+    """Inverso de codifica_jugada"""
+    if x < 0:
+        return None
+    if x >= 256:
+        return divmod(x - 256, 16)
+    return x
+
+
+def simetrias_cuadrado(n):
+    """
+    Las 8 simetrías de un tablero de n x n (casilla i = n * fila + col),
+    como permutaciones: la casilla i va a dar a la casilla p[i]. La
+    primera es la identidad
+
+    Regresa
+    -------
+    tuple: 8 tuplas de n * n enteros
+
+    """
+    simetrias = []
+    for reflejo, giros in product((False, True), range(4)):
+        p = []
+        for i in range(n * n):
+            fila, col = divmod(i, n)
+            if reflejo:
+                col = n - 1 - col
+            for _ in range(giros):
+                fila, col = col, n - 1 - fila
+            p.append(n * fila + col)
+        simetrias.append(tuple(p))
+    return tuple(simetrias)
+
+
+def zobrist_imagen(claves, s, p):
+    """
+    Hash de Zobrist de la imagen bajo la permutación p de un estado s
+    representado por casillas 0, 1, -1
+
+    """
+    h = 0
+    for i, x in enumerate(s):
+        if x != 0:
+            h ^= claves[p[i]][x == -1]
+    return h
+
+
+def inversas(simetrias):
+    """Índice de la simetría inversa de cada permutación"""
+    return tuple(
+        next(
+            k for k, q in enumerate(simetrias)
+            if all(q[p[i]] == i for i in range(len(p)))
+        )
+        for p in simetrias
+    )
+
+
+class ClaveSimetrica(int):
+    """
+    Clave canónica de un estado: la menor de las claves de Zobrist de
+    sus imágenes bajo las simetrías del juego
+
+    Se comporta como un entero (la clave canónica), y además guarda las
+    claves de todas las imágenes (para actualizarlas de forma incremental)
+    y en simetria el índice de la simetría que lleva el estado a su forma
+    canónica.
+
+    """
+    def __new__(cls, claves):
+        k = min(range(len(claves)), key=claves.__getitem__)
+        clave = super().__new__(cls, claves[k])
+        clave.claves = claves
+        clave.simetria = k
+        return clave
+
+
+class ConSimetrias:
+    """
+    Envoltura de un juego para que negamax use claves canónicas
+
+    Se comporta como el juego, pero zobrist y zobrist_transicion regresan
+    ClaveSimetrica. Se usa junto con una TablaSimetrica, que es la que
+    traduce las jugadas guardadas. El juego debe implementar
+
+        zobrist_simetrias(s): tupla con el hash de Zobrist de la imagen
+            de s bajo cada simetría (la primera es la identidad)
+        zobrist_simetrias_transicion(hs, s, a, j, s_nuevo): lo mismo
+            para s_nuevo = transicion(s, a, j) a partir de hs (s_nuevo
+            es None si se usa hacer, como en zobrist_transicion)
+        simetria_jugada(a, k): imagen de la jugada a bajo la simetría k
+        SIMETRIA_INVERSA: índice de la simetría inversa de cada una
+
+    """
+    def __init__(self, juego):
+        self.juego = juego
+
+    def __getattr__(self, nombre):
+        if nombre == 'juego':
+            raise AttributeError(nombre)
+        return getattr(self.juego, nombre)
+
+    def zobrist(self, s):
+        return ClaveSimetrica(self.juego.zobrist_simetrias(s))
+
+    def zobrist_transicion(self, h, s, a, j, s_nuevo):
+        return ClaveSimetrica(
+            self.juego.zobrist_simetrias_transicion(h.claves, s, a, j, s_nuevo)
+        )
+
+
+class TablaSimetrica(TablaTransposicion):
+    """
+    Tabla de transposición sobre claves canónicas (ClaveSimetrica)
+
+    Guarda las entradas en otra tabla con la clave canónica, y la mejor
+    jugada en la orientación canónica: al escribir se le aplica la
+    simetría de la clave, y al leer la inversa. Así las posiciones
+    simétricas comparten una sola entrada.
+
+    """
+    def __init__(self, juego, tabla=None):
+        """
+        juego (ModeloJuegoZT2): juego con simetria_jugada y
+            SIMETRIA_INVERSA (puede ser el ConSimetrias)
+        tabla (TablaTransposicion o dict): tabla donde se guardan las
+            entradas. Si None, se crea una TablaTransposicion
+
+        """
+        self.juego = juego
+        self.tabla = TablaTransposicion() if tabla is None else tabla
+
+    def get(self, clave, defecto=None):
+        entrada = self.tabla.get(int(clave))
+        if entrada is None:
+            return defecto
+        v, d, cota, a = entrada
+        if clave.simetria and a is not None:
+            a = self.juego.simetria_jugada(
+                a, self.juego.SIMETRIA_INVERSA[clave.simetria]
+            )
+        return v, d, cota, a
+
+    def __setitem__(self, clave, entrada):
+        v, d, cota, a = entrada
+        if clave.simetria and a is not None:
+            a = self.juego.simetria_jugada(a, clave.simetria)
+        self.tabla[int(clave)] = (v, d, cota, a)
+
+    def __len__(self):
+        return len(self.tabla)
+
+    @property
+    def edad(self):
+        return getattr(self.tabla, 'edad', 0)
+
+    def envejece(self):
+        if hasattr(self.tabla, 'envejece'):
+            self.tabla.envejece()
+
+    def limpia(self):
+        if hasattr(self.tabla, 'limpia'):
+            self.tabla.limpia()
+        else:
+            self.tabla.clear()
@@ -134,18 +134,22 @@ def selecciona_agente(nombre):
                 return jugador_manual_gui  # <-- pasamos la GUI luego
             elif sel in [2, 4]:
                 d = int(input("Profundidad (recomendado 2-4): "))
+                contexto = ContextoBusqueda()
                 if sel == 2:
                     return lambda juego, s, j: jugador_negamax(
-                        juego, s, j, ordena=ordena_centro_ultimate, evalua=evalua_simple_ultimate, d=d)
+                        juego, s, j, ordena=ordena_centro_ultimate, evalua=evalua_simple_ultimate, d=d,
+                        contexto=contexto)
                 else:
-                    return lambda juego, s, j: negamax_con_estado_actual(juego, s, j, d)
+                    return lambda juego, s, j: negamax_con_estado_actual(juego, s, j, d, contexto)
             elif sel in [3, 5]:
                 t = int(input("Tiempo en segundos: "))
+                contexto = ContextoBusqueda()
                 if sel == 3:
                     return lambda juego, s, j: minimax_iterativo(
-                        juego, s, j, ordena=ordena_centro_ultimate, evalua=evalua_simple_ultimate, tiempo=t)
+                        juego, s, j, ordena=ordena_centro_ultimate, evalua=evalua_simple_ultimate, tiempo=t,
+                        contexto=contexto)
                 else:
-                    return lambda juego, s, j: minimax_iter_con_estado_actual(juego, s, j, t)
+                    return lambda juego, s, j: minimax_iter_con_estado_actual(juego, s, j, t, contexto)
             else:
                 print("Opción inválida.")
         except ValueError:
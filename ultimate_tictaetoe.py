@@ -1,8 +1,18 @@
-from juegos_simplificado import ModeloJuegoZT2, juega_dos_jugadores
-from minimax import jugador_negamax, minimax_iterativo
+from juegos_simplificado import ModeloJuegoZT2, juega_dos_jugadores, compara_modelos
+from minimax import jugador_negamax, minimax_iterativo, ContextoBusqueda
+from minimax import EvaluacionPorLotes
+from mcts import jugador_mcts, ArbolMCTS
+from transposicion import claves_zobrist, simetrias_cuadrado, inversas
 from random import shuffle
+from collections import namedtuple
+from itertools import product
 import time
 
+try:
+    import numpy as np
+except ImportError:  # Solo se necesita para la evaluación por lotes
+    np = None
+
 class UltimateTicTacToe(ModeloJuegoZT2):
     """
     Implementación del juego Ultimate TicTacToe.
@@ -16,6 +26,11 @@ class UltimateTicTacToe(ModeloJuegoZT2):
     - tablero_actual: Índice del tablero en el que se debe jugar (-1 si se puede elegir cualquiera)
     - ultimo_movimiento: Tupla (tablero, posición) del último movimiento realizado
     """
+    # Claves de Zobrist: una por casilla (tablero * 9 + posición) y jugador,
+    # y una por cada valor de tablero_actual (-1 a 8)
+    ZOBRIST = claves_zobrist(81)
+    ZOBRIST_TABLERO = claves_zobrist(10, 1, semilla=1)
+    SIMETRIA_INVERSA = inversas(simetrias_cuadrado(3))
     
     def inicializa(self):
         """Inicializa el juego con tableros vacíos"""
@@ -94,12 +109,12 @@ class UltimateTicTacToe(ModeloJuegoZT2):
             return True
         
         # Verificar si todos los tableros están completos o tienen ganador
-        tableros_disponibles = 0
         for tablero in tableros:
-            if not self._tablero_lleno(tablero) and not self._hay_ganador(tablero):
-                tableros_disponibles += 1
+            estado = ESTADOS_TABLERO[tablero]
+            if not estado.lleno and estado.ganador == 0:
+                return False
         
-        return tableros_disponibles == 0
+        return True
     
     def ganancia(self, s):
         """Determina la ganancia para el jugador 1 en el estado terminal s"""
@@ -108,59 +123,357 @@ class UltimateTicTacToe(ModeloJuegoZT2):
         # Obtener el meta-tablero (resultados de cada tablero pequeño)
         meta_tablero = self._obtener_meta_tablero(tableros)
         
-        # Verificar ganador en el meta-tablero
-        for linea in self._lineas_ganadoras():
-            if (meta_tablero[linea[0]] == meta_tablero[linea[1]] == meta_tablero[linea[2]] != 0):
-                return meta_tablero[linea[0]]
-        
-        return 0  # Empate
+        # Ganador en el meta-tablero (0 si es empate)
+        return ESTADOS_TABLERO[tuple(meta_tablero)].ganador
+    
+    def zobrist(self, s):
+        """Hash de Zobrist del estado (ignora ultimo_movimiento)"""
+        tableros, tablero_actual, _ = s
+        h = self.ZOBRIST_TABLERO[tablero_actual + 1][0]
+        for tb, tablero in enumerate(tableros):
+            for pos, x in enumerate(tablero):
+                if x != 0:
+                    h ^= self.ZOBRIST[9 * tb + pos][x == -1]
+        return h
+    
+    def zobrist_transicion(self, h, s, a, j, s_nuevo):
+        """Hash de s_nuevo = transicion(s, a, j) a partir del hash h de s"""
+        tablero_idx, pos = a
+        return (
+            h ^ self.ZOBRIST[9 * tablero_idx + pos][j == -1]
+            ^ self.ZOBRIST_TABLERO[s[1] + 1][0]
+            ^ self.ZOBRIST_TABLERO[
+                (s_nuevo[1] if s_nuevo is not None
+                 else self._proximo_tablero(s[0], a, j)) + 1
+            ][0]
+        )
+    
+    def zobrist_simetrias(self, s):
+        """
+        Hash de Zobrist de la imagen de s bajo cada una de las 8
+        simetrías, aplicadas a la vez al meta-tablero y a cada tablero
+        pequeño (ver ConSimetrias)
+        """
+        tableros, tablero_actual, _ = s
+        claves = []
+        for p in SIMETRIAS:
+            h = self.ZOBRIST_TABLERO[_imagen_tablero(p, tablero_actual) + 1][0]
+            for tb, tablero in enumerate(tableros):
+                for pos, x in enumerate(tablero):
+                    if x != 0:
+                        h ^= self.ZOBRIST[9 * p[tb] + p[pos]][x == -1]
+            claves.append(h)
+        return tuple(claves)
+    
+    def zobrist_simetrias_transicion(self, hs, s, a, j, s_nuevo):
+        """zobrist_simetrias de s_nuevo = transicion(s, a, j) a partir de hs"""
+        tablero_idx, pos = a
+        proximo = (s_nuevo[1] if s_nuevo is not None
+                   else self._proximo_tablero(s[0], a, j))
+        return tuple(
+            h ^ self.ZOBRIST[9 * p[tablero_idx] + p[pos]][j == -1]
+            ^ self.ZOBRIST_TABLERO[_imagen_tablero(p, s[1]) + 1][0]
+            ^ self.ZOBRIST_TABLERO[_imagen_tablero(p, proximo) + 1][0]
+            for h, p in zip(hs, SIMETRIAS)
+        )
+    
+    def simetria_jugada(self, a, k):
+        """Imagen de la jugada a bajo la simetría k"""
+        p = SIMETRIAS[k]
+        return (p[a[0]], p[a[1]])
+    
+    def mutable(self, s):
+        """Copia mutable del estado (ver EstadoUltimate)"""
+        tableros, tablero_actual, ultimo_movimiento = s
+        return EstadoUltimate([list(tableros), tablero_actual, ultimo_movimiento])
+    
+    def hacer(self, estado, a, j):
+        """
+        Realiza la jugada a del jugador j en el estado mutable.
+        Los tableros pequeños se toman de TABLERO_CODIGO, así que no se
+        construye ninguna tupla
+        """
+        tableros = estado[0]
+        tablero_idx, pos = a
+        estado.pila.append(estado[1])
+        estado.pila.append(estado[2])
+        tableros[tablero_idx] = pon_ficha(tableros[tablero_idx], pos, j)
+        estado[1] = self._proximo_tablero(tableros, a, 0)
+        estado[2] = a
+    
+    def deshacer(self, estado, a, j):
+        """Revierte la jugada a del jugador j en el estado mutable"""
+        tablero_idx, pos = a
+        estado[0][tablero_idx] = quita_ficha(estado[0][tablero_idx], pos)
+        estado[2] = estado.pila.pop()
+        estado[1] = estado.pila.pop()
+    
+    def _proximo_tablero(self, tableros, a, j):
+        """
+        Tablero en el que se jugará después de que el jugador j haga la
+        jugada a (con j=0 si ya está hecha)
+        """
+        tablero_idx, pos = a
+        tablero = tableros[pos]
+        if j != 0 and pos == tablero_idx:
+            tablero = pon_ficha(tablero, pos, j)
+        estado = ESTADOS_TABLERO[tablero]
+        return -1 if estado.lleno or estado.ganador != 0 else pos
     
     def _tablero_lleno(self, tablero):
         """Verifica si un tablero está lleno"""
-        return 0 not in tablero
+        return ESTADOS_TABLERO[tablero].lleno
     
     def _hay_ganador(self, tablero):
         """Determina si hay un ganador en un tablero pequeño"""
-        for linea in self._lineas_ganadoras():
-            if (tablero[linea[0]] == tablero[linea[1]] == tablero[linea[2]] != 0):
-                return True
-        return False
+        return ESTADOS_TABLERO[tablero].ganador != 0
     
     def _obtener_ganador_tablero(self, tablero):
         """Obtiene el ganador de un tablero pequeño (0 si no hay ganador)"""
-        for linea in self._lineas_ganadoras():
-            if (tablero[linea[0]] == tablero[linea[1]] == tablero[linea[2]] != 0):
-                return tablero[linea[0]]
-        return 0
+        return ESTADOS_TABLERO[tablero].ganador
     
     def _obtener_meta_tablero(self, tableros):
         """
         Convierte los 9 tableros pequeños en un meta-tablero 
         donde cada posición indica el ganador de cada tablero pequeño
         """
-        meta_tablero = [0] * 9
-        for i, tablero in enumerate(tableros):
-            meta_tablero[i] = self._obtener_ganador_tablero(tablero)
-        return meta_tablero
+        return [ESTADOS_TABLERO[tablero].ganador for tablero in tableros]
     
     def _hay_ganador_global(self, tableros):
         """Determina si hay un ganador en el meta-tablero"""
-        meta_tablero = self._obtener_meta_tablero(tableros)
-        for linea in self._lineas_ganadoras():
-            if (meta_tablero[linea[0]] == meta_tablero[linea[1]] == meta_tablero[linea[2]] != 0):
-                return True
-        return False
+        return ESTADOS_TABLERO[tuple(self._obtener_meta_tablero(tableros))].ganador != 0
     
     def _lineas_ganadoras(self):
         """Devuelve todas las líneas ganadoras posibles (filas, columnas, diagonales)"""
+        return LINEAS
+
+
+
+# Tablas precalculadas sobre los 512 patrones de un tablero de 3x3 (bit i = casilla i)
+LINEAS = ((0, 1, 2), (3, 4, 5), (6, 7, 8),
+          (0, 3, 6), (1, 4, 7), (2, 5, 8),
+          (0, 4, 8), (2, 4, 6))
+MASCARAS_LINEAS = tuple(sum(1 << p for p in linea) for linea in LINEAS)
+GANA = tuple(
+    any(m & linea == linea for linea in MASCARAS_LINEAS) for m in range(512)
+)
+CASILLAS = tuple(tuple(p for p in range(9) if m >> p & 1) for m in range(512))
+LLENO = 511
+# Las 8 simetrías de un tablero de 3x3 (se aplican igual al meta-tablero)
+SIMETRIAS = simetrias_cuadrado(3)
+
+def _imagen_tablero(p, tablero_actual):
+    """Imagen de tablero_actual bajo la simetría p (-1 se queda igual)"""
+    return -1 if tablero_actual == -1 else p[tablero_actual]
+
+
+# Tabla precalculada con la situación de cada uno de los 3^9 tableros pequeños
+# (indexada por el propio tablero, una tupla de 9 elementos 0, 1, -1).
+# Los campos por jugador son tuplas de 3 que se indexan con el jugador j:
+# el elemento 1 es para X y el elemento -1 para O.
+#
+#   ganador: ganador del tablero (0 si nadie)
+#   lleno: True si no quedan casillas vacías
+#   abiertas[j]: líneas sin fichas del oponente de j
+#   amenazas[j]: líneas con 2 fichas de j y una casilla vacía
+#   completa[j][pos]: líneas que j completa al jugar en pos
+EstadoTablero = namedtuple('EstadoTablero', 'ganador lleno abiertas amenazas completa')
+
+def _estado_tablero(tablero):
+    """Calcula la entrada de ESTADOS_TABLERO para un tablero"""
+    ganador = 0
+    for linea in LINEAS:
+        if tablero[linea[0]] == tablero[linea[1]] == tablero[linea[2]] != 0:
+            ganador = tablero[linea[0]]
+            break
+    abiertas, amenazas = [0, 0, 0], [0, 0, 0]
+    completa = [[0] * 9 for _ in range(3)]
+    for linea in LINEAS:
+        valores = [tablero[p] for p in linea]
+        for j in (1, -1):
+            if -j not in valores:
+                abiertas[j] += 1
+            if valores.count(j) == 2 and valores.count(0) == 1:
+                amenazas[j] += 1
+                completa[j][linea[valores.index(0)]] += 1
+    return EstadoTablero(
+        ganador, 0 not in tablero, tuple(abiertas), tuple(amenazas),
+        tuple(tuple(c) for c in completa)
+    )
+
+ESTADOS_TABLERO = {
+    tablero: _estado_tablero(tablero)
+    for tablero in product((0, 1, -1), repeat=9)
+}
+
+# Cada tablero pequeño como número en base 3 (el dígito pos es 0 si la
+# casilla está vacía, 1 si es de X y 2 si es de O) y el tablero de cada
+# número, para poner y quitar fichas sin construir tuplas nuevas
+CODIGO_TABLERO = {
+    tablero: sum((x % 3) * 3 ** pos for pos, x in enumerate(tablero))
+    for tablero in ESTADOS_TABLERO
+}
+TABLERO_CODIGO = [None] * 3 ** 9
+for _tablero, _codigo in CODIGO_TABLERO.items():
+    TABLERO_CODIGO[_codigo] = _tablero
+# DIGITOS[pos][j]: lo que suma al código una ficha de j en pos
+DIGITOS = tuple((0, 3 ** pos, 2 * 3 ** pos) for pos in range(9))
+
+def pon_ficha(tablero, pos, j):
+    """El tablero pequeño con una ficha de j en la casilla vacía pos"""
+    return TABLERO_CODIGO[CODIGO_TABLERO[tablero] + DIGITOS[pos][j]]
+
+def quita_ficha(tablero, pos):
+    """El tablero pequeño con la casilla pos vacía"""
+    return TABLERO_CODIGO[CODIGO_TABLERO[tablero] - DIGITOS[pos][tablero[pos]]]
+
+
+class EstadoUltimate(list):
+    """
+    Estado mutable de UltimateTicTacToe para hacer/deshacer: la lista
+    [tableros, tablero_actual, ultimo_movimiento], con los tableros en
+    una lista, y en pila los valores de tablero_actual y
+    ultimo_movimiento que hay que restaurar al deshacer
+    """
+    __slots__ = ('pila',)
+    
+    def __init__(self, estado):
+        super().__init__(estado)
+        self.pila = []
+
+
+class UltimateTicTacToeBitboard(ModeloJuegoZT2):
+    """
+    Ultimate TicTacToe sobre bitboards.
+    
+    El estado es una tupla (x, o, meta_x, meta_o, cerrados, tablero_actual, ganador):
+    
+    - x, o: fichas de cada jugador, 9 bits por tablero pequeño
+      (la casilla pos del tablero tb es el bit 9 * tb + pos)
+    - meta_x, meta_o: tableros pequeños ganados por cada jugador (9 bits)
+    - cerrados: tableros ganados o llenos, donde ya no se puede jugar (9 bits)
+    - tablero_actual: como en UltimateTicTacToe (-1 si se puede elegir)
+    - ganador: ganador del meta-tablero (0 si nadie)
+    
+    Los meta-tableros se actualizan en transicion solo para el tablero
+    donde se jugó, y las líneas ganadoras se consultan en la tabla GANA,
+    así que jugadas_legales, terminal y ganancia son unas cuantas
+    operaciones de bits. Las jugadas son las mismas que en UltimateTicTacToe.
+    """
+    ZOBRIST = UltimateTicTacToe.ZOBRIST
+    ZOBRIST_TABLERO = UltimateTicTacToe.ZOBRIST_TABLERO
+    
+    def inicializa(self):
+        return ((0, 0, 0, 0, 0, -1, 0), 1)
+    
+    def jugadas_legales(self, s, j):
+        x, o, _, _, cerrados, tablero_actual, _ = s
+        ocupadas = x | o
+        if tablero_actual != -1:
+            tableros = (tablero_actual,)
+        else:
+            tableros = CASILLAS[LLENO & ~cerrados]
         return [
-            # Filas
-            (0, 1, 2), (3, 4, 5), (6, 7, 8),
-            # Columnas
-            (0, 3, 6), (1, 4, 7), (2, 5, 8),
-            # Diagonales
-            (0, 4, 8), (2, 4, 6)
+            (tb, pos) for tb in tableros
+            for pos in CASILLAS[LLENO & ~(ocupadas >> 9 * tb)]
         ]
+    
+    def transicion(self, s, a, j):
+        x, o, meta_x, meta_o, cerrados, _, ganador = s
+        tablero_idx, pos = a
+        desp = 9 * tablero_idx
+        if j == 1:
+            x |= 1 << (desp + pos)
+            if GANA[(x >> desp) & LLENO]:
+                meta_x |= 1 << tablero_idx
+                ganador = 1 if GANA[meta_x] else 0
+        else:
+            o |= 1 << (desp + pos)
+            if GANA[(o >> desp) & LLENO]:
+                meta_o |= 1 << tablero_idx
+                ganador = -1 if GANA[meta_o] else 0
+        if (meta_x | meta_o) >> tablero_idx & 1 or ((x | o) >> desp) & LLENO == LLENO:
+            cerrados |= 1 << tablero_idx
+        proximo_tablero = -1 if cerrados >> pos & 1 else pos
+        return (x, o, meta_x, meta_o, cerrados, proximo_tablero, ganador)
+    
+    def terminal(self, s):
+        return s[6] != 0 or s[4] == LLENO
+    
+    def ganancia(self, s):
+        return s[6]
+    
+    def zobrist(self, s):
+        """Hash de Zobrist del estado (el mismo que en UltimateTicTacToe)"""
+        x, o, _, _, _, tablero_actual, _ = s
+        h = self.ZOBRIST_TABLERO[tablero_actual + 1][0]
+        for i in range(81):
+            if x >> i & 1:
+                h ^= self.ZOBRIST[i][0]
+            elif o >> i & 1:
+                h ^= self.ZOBRIST[i][1]
+        return h
+    
+    def zobrist_transicion(self, h, s, a, j, s_nuevo):
+        """Hash de s_nuevo = transicion(s, a, j) a partir del hash h de s"""
+        tablero_idx, pos = a
+        return (
+            h ^ self.ZOBRIST[9 * tablero_idx + pos][j == -1]
+            ^ self.ZOBRIST_TABLERO[s[5] + 1][0]
+            ^ self.ZOBRIST_TABLERO[s_nuevo[5] + 1][0]
+        )
+
+
+def bitboard_a_ultimate(s):
+    """
+    Convierte un estado de UltimateTicTacToeBitboard a uno de
+    UltimateTicTacToe (sin el último movimiento)
+    """
+    x, o, _, _, _, tablero_actual, _ = s
+    tableros = tuple(
+        tuple(
+            1 if x >> (9 * tb + pos) & 1 else -1 if o >> (9 * tb + pos) & 1 else 0
+            for pos in range(9)
+        )
+        for tb in range(9)
+    )
+    return (tableros, tablero_actual, None)
+
+
+def ultimate_a_bitboard(s):
+    """Convierte un estado de UltimateTicTacToe a uno de UltimateTicTacToeBitboard"""
+    tableros, tablero_actual, _ = s
+    x = o = meta_x = meta_o = cerrados = 0
+    for tb, tablero in enumerate(tableros):
+        for pos, v in enumerate(tablero):
+            if v == 1:
+                x |= 1 << (9 * tb + pos)
+            elif v == -1:
+                o |= 1 << (9 * tb + pos)
+        if GANA[(x >> 9 * tb) & LLENO]:
+            meta_x |= 1 << tb
+        elif GANA[(o >> 9 * tb) & LLENO]:
+            meta_o |= 1 << tb
+        if (meta_x | meta_o) >> tb & 1 or 0 not in tablero:
+            cerrados |= 1 << tb
+    ganador = 1 if GANA[meta_x] else -1 if GANA[meta_o] else 0
+    return (x, o, meta_x, meta_o, cerrados, tablero_actual, ganador)
+
+
+def evalua_simple_ultimate_bitboard(s):
+    """Como evalua_simple_ultimate, para UltimateTicTacToeBitboard"""
+    if s[6] != 0 or s[4] == LLENO:
+        return s[6]
+    return (bin(s[2]).count('1') - bin(s[3]).count('1')) / 9
+
+
+def compara_nodos_por_segundo(d=4):
+    """
+    Compara los nodos por segundo de UltimateTicTacToe y
+    UltimateTicTacToeBitboard recorriendo el árbol completo hasta
+    profundidad d
+    """
+    return compara_modelos([UltimateTicTacToe(), UltimateTicTacToeBitboard()], d)
 
 
 # Funciones para visualizar el tablero
@@ -320,11 +633,6 @@ def ordena_estrategico_ultimate(jugadas, juego, s, j):
     if juego is None:
 
         juego = UltimateTicTacToe()
-    if s is None:
-
-        global _estado_actual
-
-        s = _estado_actual
     if j is None:
 
         j = 1
@@ -339,11 +647,8 @@ def ordena_estrategico_ultimate(jugadas, juego, s, j):
     for jugada in jugadas:
         tablero_idx, pos = jugada
         
-        # Hacer una copia del tablero para simular
         tablero_original = tableros[tablero_idx]
-        tablero_simulado = list(tablero_original)
-        tablero_simulado[pos] = j
-        tablero_simulado = tuple(tablero_simulado)
+        estado_original = ESTADOS_TABLERO[tablero_original]
         
         valor = 0
         
@@ -364,30 +669,20 @@ def ordena_estrategico_ultimate(jugadas, juego, s, j):
             valor += 1
         
         # 3. Verificar si esta jugada gana el tablero
-        if not juego._hay_ganador(tablero_original):
-            lineas = juego._lineas_ganadoras()
-            for linea in lineas:
-                if pos in linea:
-                    # Comprobar si completamos una línea
-                    if (all(tablero_simulado[p] == j for p in linea)):
-                        valor += 100  # Alta prioridad para ganar tablero
+        #    (una vez por cada línea que completa)
+        if estado_original.ganador == 0:
+            valor += 100 * estado_original.completa[j][pos]  # Alta prioridad para ganar tablero
         
         # 4. Verificar si esta jugada bloquea al oponente
-        oponente = -j
-        for linea in juego._lineas_ganadoras():
-            if pos in linea:
-                # Contar fichas del oponente en esta línea
-                fichas_oponente = sum(1 for p in linea if tablero_original[p] == oponente)
-                # Si el oponente tiene 2 fichas y bloqueamos la tercera
-                if fichas_oponente == 2 and all(tablero_original[p] != j for p in linea if p != pos):
-                    valor += 50  # Prioridad para bloquear
+        #    (una vez por cada línea con 2 fichas del oponente que bloquea)
+        valor += 50 * estado_original.completa[-j][pos]  # Prioridad para bloquear
         
         # 5. Verificar si envía al oponente a un tablero favorable para nosotros
         siguiente_tablero = pos
         if siguiente_tablero < 9:  # Asegurarse que es un tablero válido
             # Si el siguiente tablero ya tiene ganador o está lleno
-            if (juego._hay_ganador(tableros[siguiente_tablero]) or 
-                juego._tablero_lleno(tableros[siguiente_tablero])):
+            estado_siguiente = ESTADOS_TABLERO[tableros[siguiente_tablero]]
+            if estado_siguiente.ganador != 0 or estado_siguiente.lleno:
                 valor += 20  # Buena estrategia enviar a un tablero ya resuelto
             elif siguiente_tablero == 4:  # Evitar enviar al centro si está libre
                 valor -= 15
@@ -489,8 +784,9 @@ def evalua_avanzada_ultimate(s, j=None):
     # 4. Evaluar tableros individuales para detectar ventajas tácticas
     valor_tactico = 0
     for idx, tablero in enumerate(tableros):
+        estado_tablero = ESTADOS_TABLERO[tablero]
         # Si el tablero no está ganado todavía
-        if meta_tablero[idx] == 0 and not juego._tablero_lleno(tablero):
+        if meta_tablero[idx] == 0 and not estado_tablero.lleno:
             # Ventaja posicional: piezas propias vs oponente
             piezas_j = tablero.count(j)
             piezas_oponente = tablero.count(-j)
@@ -505,26 +801,18 @@ def evalua_avanzada_ultimate(s, j=None):
             ventaja_tablero = (piezas_j - piezas_oponente) / 9 * 0.05 * multiplicador
             valor_tactico += ventaja_tablero
             
-            # Detectar amenazas de victoria en cada tablero
-            for linea in juego._lineas_ganadoras():
-                # Contar piezas propias y vacías en esta línea
-                propias_linea = sum(1 for pos in linea if tablero[pos] == j)
-                vacias_linea = sum(1 for pos in linea if tablero[pos] == 0)
-                
-                # Amenaza de victoria (2 propias y 1 vacía)
-                if propias_linea == 2 and vacias_linea == 1:
-                    valor_tactico += 0.1
-                
-                # Bloqueo potencial de victoria del oponente
-                oponente_linea = sum(1 for pos in linea if tablero[pos] == -j)
-                if oponente_linea == 2 and vacias_linea == 1:
-                    valor_tactico -= 0.08  # Penalizar menos que el beneficio de ganar
+            # Amenazas de victoria (2 propias y 1 vacía) y bloqueos potenciales
+            # de victoria del oponente (se penalizan menos que el beneficio de ganar)
+            valor_tactico += (
+                0.1 * estado_tablero.amenazas[j] - 0.08 * estado_tablero.amenazas[-j]
+            )
     
     # 5. Ventaja de movimiento (si el siguiente tablero nos da ventaja)
     valor_movimiento = 0
     if tablero_actual != -1:
         # Si nos toca jugar en un tablero específico, evaluar si es favorable
-        if juego._hay_ganador(tableros[tablero_actual]) or juego._tablero_lleno(tableros[tablero_actual]):
+        estado_actual = ESTADOS_TABLERO[tableros[tablero_actual]]
+        if estado_actual.ganador != 0 or estado_actual.lleno:
             # Si es un tablero ya resuelto, es ventajoso para el oponente (puede elegir)
             valor_movimiento -= 0.05
         elif tablero_actual == 4:  # Centro
@@ -544,43 +832,138 @@ def evalua_avanzada_ultimate(s, j=None):
     return max(min(valor_final, 0.99), -0.99)
 
 
-# Variable global para almacenar el estado actual (para función de ordenamiento)
-_estado_actual = None
+# Evaluación por lotes con NumPy (opcional): los estados son renglones de
+# un arreglo de (N, 81) int8 con las casillas (9 * tablero + posición), y
+# opcionalmente una columna 82 con el tablero_actual
 
-def set_estado_actual(estado):
-    """Función auxiliar para establecer el estado global"""
-    global _estado_actual
-    _estado_actual = estado
+def arreglo_ultimate(estados):
+    """
+    Lista de estados de UltimateTicTacToe como arreglo de NumPy de
+    (N, 82) int8: las 81 casillas y el tablero_actual
+    """
+    if np is None:
+        raise ImportError("La evaluación por lotes necesita NumPy")
+    return np.array(
+        [
+            [x for tablero in tableros for x in tablero] + [tablero_actual]
+            for tableros, tablero_actual, _ in estados
+        ],
+        dtype=np.int8
+    ).reshape(-1, 82)
 
+if np is not None:
+    _LINEAS = np.array(LINEAS)
 
-def ordena_con_estado_actual(jugadas, j=None):
+def _ganador_lineas(sumas):
     """
-    Función de ordenamiento que utiliza el estado global actual.
-    Compatible con la API de minimax y negamax.
+    Ganador de cada tablero a partir de las sumas de sus líneas (la
+    primera línea completa en el orden de LINEAS, como en ESTADOS_TABLERO)
     """
-    global _estado_actual
-    
-    if j is None:
-        j = 1
-    
-    if _estado_actual is None:
-        # Si no hay estado actual, usar ordenamiento básico
-        return ordena_centro_ultimate(jugadas)
-    
-    # Usar ordenamiento estratégico con el estado actual
-    return ordena_estrategico_ultimate(jugadas, UltimateTicTacToe(), _estado_actual, j)
+    completas = np.abs(sumas) == 3
+    primera = np.take_along_axis(sumas, completas.argmax(axis=-1)[..., None], axis=-1)[..., 0]
+    return np.where(completas.any(axis=-1), np.sign(primera), 0)
+
+def evalua_avanzada_ultimate_lote(tableros, j=1):
+    """
+    evalua_avanzada_ultimate para cada renglón de un arreglo de (N, 81)
+    o (N, 82) (con el tablero_actual en la última columna; si no está,
+    se toma como -1)
+
+    Los términos se acumulan en el mismo orden que en la versión de un
+    estado, así que los valores son los mismos.
+    """
+    n = len(tableros)
+    if tableros.shape[1] == 82:
+        tablero_actual = tableros[:, 81].astype(np.int64)
+    else:
+        tablero_actual = np.full(n, -1)
+    casillas = tableros[:, :81].reshape(n, 9, 9) * np.int8(j)
+    sumas = casillas[:, :, _LINEAS].sum(axis=3)
+    ganador = _ganador_lineas(sumas)
+    lleno = (casillas != 0).all(axis=2)
+    ganador_global = _ganador_lineas(ganador[:, _LINEAS].sum(axis=2))
+    terminal = (ganador_global != 0) | ((ganador != 0) | lleno).all(axis=1)
+
+    # 1. Tableros ganados
+    valor_tableros = ((ganador == 1).sum(axis=1) - (ganador == -1).sum(axis=1)) / 9 * 0.5
+
+    # 2. Líneas potenciales en el meta-tablero
+    valor_lineas = np.zeros(n)
+    for linea in LINEAS:
+        fichas_propias = (ganador[:, linea] == 1).sum(axis=1)
+        fichas_oponente = (ganador[:, linea] == -1).sum(axis=1)
+        valor_lineas += np.where(
+            (fichas_propias > 0) & (fichas_oponente == 0), fichas_propias * 0.1, 0
+        )
+        valor_lineas -= np.where(
+            (fichas_oponente > 0) & (fichas_propias == 0), fichas_oponente * 0.1, 0
+        )
+
+    # 3. Centro y esquinas del meta-tablero
+    valor_estrategico = np.zeros(n)
+    for pos, valor in {4: 0.1, 0: 0.05, 2: 0.05, 6: 0.05, 8: 0.05}.items():
+        valor_estrategico += np.where(ganador[:, pos] == 1, valor, 0)
+        valor_estrategico -= np.where(ganador[:, pos] == -1, valor, 0)
+
+    # 4. Tableros individuales abiertos
+    piezas = (casillas == 1).sum(axis=2) - (casillas == -1).sum(axis=2)
+    amenazas_j = (sumas == 2).sum(axis=2)
+    amenazas_oponente = (sumas == -2).sum(axis=2)
+    abierto = (ganador == 0) & ~lleno
+    valor_tactico = np.zeros(n)
+    for idx in range(9):
+        multiplicador = 1.5 if idx == 4 else 1.2 if idx in (0, 2, 6, 8) else 1.0
+        valor_tactico += np.where(
+            abierto[:, idx], piezas[:, idx] / 9 * 0.05 * multiplicador, 0
+        )
+        valor_tactico += np.where(
+            abierto[:, idx],
+            0.1 * amenazas_j[:, idx] - 0.08 * amenazas_oponente[:, idx], 0
+        )
+
+    # 5. Tablero al que se envía al siguiente jugador
+    actual = np.maximum(tablero_actual, 0)[:, None]
+    resuelto = (
+        (np.take_along_axis(ganador, actual, axis=1)[:, 0] != 0) |
+        np.take_along_axis(lleno, actual, axis=1)[:, 0]
+    )
+    valor_movimiento = np.where(
+        tablero_actual == -1, 0,
+        np.where(resuelto, -0.05, np.where(tablero_actual == 4, 0.05, 0))
+    )
+
+    valor_final = (
+        valor_tableros * 0.4 +
+        valor_lineas * 0.25 +
+        valor_estrategico * 0.15 +
+        valor_tactico * 0.15 +
+        valor_movimiento * 0.05
+    )
+    return np.where(terminal, ganador_global, np.clip(valor_final, -0.99, 0.99))
 
+# Versión de evalua_avanzada_ultimate que negamax puede usar por lotes
+# (solo en los nodos con al menos MINIMO_LOTE jugadas, con tiro libre)
+evalua_avanzada_ultimate_lotes = EvaluacionPorLotes(
+    evalua_avanzada_ultimate, evalua_avanzada_ultimate_lote, arreglo_ultimate
+)
+
+
+def ordena_con_estado_actual(juego, estado, jugadas, j):
+    """
+    Función de ordenamiento con estado para el negamax: aplica el
+    ordenamiento estratégico al estado del nodo que se está expandiendo.
+    """
+    return ordena_estrategico_ultimate(jugadas, juego, estado, j)
 
-def negamax_con_estado_actual(juego, s, j, d):
-    """Wrapper para jugador_negamax que incluye el estado actual"""
-    set_estado_actual(s)  # Establecer el estado global
-    return jugador_negamax(juego, s, j, ordena=ordena_con_estado_actual, evalua=evalua_avanzada_ultimate, d=d)
 
+def negamax_con_estado_actual(juego, s, j, d, contexto=None):
+    """Wrapper para jugador_negamax con el ordenamiento estratégico"""
+    return jugador_negamax(juego, s, j, ordena=ordena_con_estado_actual, evalua=evalua_avanzada_ultimate, d=d, contexto=contexto)
 
-def minimax_iter_con_estado_actual(juego, s, j, tiempo):
-    """Wrapper para minimax_iterativo que incluye el estado actual"""
-    set_estado_actual(s)  # Establecer el estado global
-    return minimax_iterativo(juego, s, j, ordena=ordena_con_estado_actual, evalua=evalua_avanzada_ultimate, tiempo=tiempo)
+
+def minimax_iter_con_estado_actual(juego, s, j, tiempo, contexto=None):
+    """Wrapper para minimax_iterativo con el ordenamiento estratégico"""
+    return minimax_iterativo(juego, s, j, ordena=ordena_con_estado_actual, evalua=evalua_avanzada_ultimate, tiempo=tiempo, contexto=contexto)
 
 
 # Script principal para jugar
@@ -608,8 +991,9 @@ if __name__ == '__main__':
         print("   3. IA simple (prioriza centro, tiempo limitado)")
         print("   4. IA avanzada (estratégica, profundidad limitada)")
         print("   5. IA avanzada (estratégica, tiempo limitado)")
+        print("   6. IA Monte Carlo (MCTS, tiempo limitado)")
         
-        while sel not in [1, 2, 3, 4, 5]:
+        while sel not in [1, 2, 3, 4, 5, 6]:
             try:
                 sel = int(input(f"Jugador para las {' XO'[j]}: "))
             except ValueError:
@@ -624,8 +1008,8 @@ if __name__ == '__main__':
                     d = int(input("Profundidad (recomendado 2-4): "))
                 except ValueError:
                     print("Por favor, introduce un número entero positivo.")
-            jugs.append(lambda juego, s, j: jugador_negamax(
-                juego, s, j, ordena=ordena_centro_ultimate, evalua=evalua_simple_ultimate, d=d)
+            jugs.append(lambda juego, s, j, d=d, c=ContextoBusqueda(): jugador_negamax(
+                juego, s, j, ordena=ordena_centro_ultimate, evalua=evalua_simple_ultimate, d=d, contexto=c)
             )
         elif sel == 3:
             t = None
@@ -634,8 +1018,8 @@ if __name__ == '__main__':
                     t = int(input("Tiempo en segundos: "))
                 except ValueError:
                     print("Por favor, introduce un número entero positivo.")
-            jugs.append(lambda juego, s, j: minimax_iterativo(
-                juego, s, j, ordena=ordena_centro_ultimate, evalua=evalua_simple_ultimate, tiempo=t)
+            jugs.append(lambda juego, s, j, t=t, c=ContextoBusqueda(): minimax_iterativo(
+                juego, s, j, ordena=ordena_centro_ultimate, evalua=evalua_simple_ultimate, tiempo=t, contexto=c)
             )
         elif sel == 4:
             d = None
@@ -644,7 +1028,15 @@ if __name__ == '__main__':
                     d = int(input("Profundidad (recomendado 2-4): "))
                 except ValueError:
                     print("Por favor, introduce un número entero positivo.")
-            jugs.append(lambda juego, s, j: negamax_con_estado_actual(juego, s, j, d))
+            jugs.append(lambda juego, s, j, d=d, c=ContextoBusqueda(): negamax_con_estado_actual(juego, s, j, d, c))
+        elif sel == 6:
+            t = None
+            while not isinstance(t, int) or t < 1:
+                try:
+                    t = int(input("Tiempo en segundos: "))
+                except ValueError:
+                    print("Por favor, introduce un número entero positivo.")
+            jugs.append(lambda juego, s, j, t=t, a=ArbolMCTS(): jugador_mcts(juego, s, j, tiempo=t, arbol=a))
         else:  # sel == 5
             t = None
             while not isinstance(t, int) or t < 1:
@@ -652,7 +1044,7 @@ if __name__ == '__main__':
                     t = int(input("Tiempo en segundos: "))
                 except ValueError:
                     print("Por favor, introduce un número entero positivo.")
-            jugs.append(lambda juego, s, j: minimax_iter_con_estado_actual(juego, s, j, t))
+            jugs.append(lambda juego, s, j, t=t, c=ContextoBusqueda(): minimax_iter_con_estado_actual(juego, s, j, t, c))
     
     # Jugar la partida
     print("\n¡Comienza el juego!\n")